@@ -1,10 +1,44 @@
 import logging
-import pandas
+import sys
+import numpy as np
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+def sliding_max(values, window:int):
+	"""Return max of values[i:i+window] for every i in linear time
+
+	Windows running past the end are truncated. Uses the van Herk/Gil-Werman
+	block prefix/suffix maxima.
+	"""
+	values = np.asarray(values, dtype=float)
+	n = len(values)
+	blocks = -(-n // window) + 1
+	padded = np.full(blocks * window, -np.inf)
+	padded[:n] = values
+	grid = padded.reshape(blocks, window)
+	prefix = np.maximum.accumulate(grid, axis=1).ravel()
+	suffix = np.maximum.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+	idx = np.arange(n)
+	return np.maximum(suffix[idx], prefix[idx + window - 1])
+
+def is_candles(data) -> bool:
+	"""Check for a pandas DataFrame or a field -> column mapping
+
+	Columns may be numpy arrays, the stdlib array type or lists. pandas is
+	never imported here, data can only be a DataFrame if it already was.
+	"""
+	if isinstance(data, Mapping):
+		return True
+	pandas = sys.modules.get("pandas")
+	return pandas is not None and isinstance(data, pandas.DataFrame)
+
+def get_columns(data, *names) -> tuple:
+	"""Return data columns as contiguous float arrays, without copying when possible"""
+	return tuple(np.ascontiguousarray(data[name], dtype=float).reshape(-1) for name in names)
+
 class Analyzer:
 	""" Analyzer wrapper class
 
@@ -55,7 +89,7 @@ class BaseAnalyzer(ABC):
 
 	def getResult(self):
 		"""Get analysis results"""
-		if not self.result:
+		if self.result is None:
 			logger.error("No results found")
 			raise ValueError("No results found")
 		return self.result
@@ -65,6 +99,10 @@ class BaseAnalyzer(ABC):
 		"""Verify required data type"""
 		pass
 
+	def getColumns(self, *names) -> tuple:
+		"""Return requested data columns as contiguous float arrays"""
+		return get_columns(self.data, *names)
+
 class AverageAnalyzer(BaseAnalyzer):
 	"""Average analyzer class
 	
@@ -79,23 +117,21 @@ class AverageAnalyzer(BaseAnalyzer):
 		super().__init__(data)
 		self.avg_vol = None
 		self.avg_price = None
-		self.rolling_avg_price = []
-		self.rolling_avg_vol = []
+		self.rolling_avg_price = None
+		self.rolling_avg_vol = None
 
 	def calculateAverages(self):
-		"""Calculate averages"""
-		total_vol = 0
-		total_p = 0
-		ctr = 0
-		for _, day in self.data.iterrows():
-			total_vol += day["Volume"]
-			total_p += (day["High"] + day["Low"]) / 2
-			ctr += 1
-			self.rolling_avg_price.append(total_p / ctr)
-			self.rolling_avg_vol.append(total_vol / ctr)
-		self.avg_vol = total_vol / ctr
+		"""Calculate expanding averages"""
+		high, low, volume = self.getColumns("High", "Low", "Volume")
+		if len(volume) == 0:
+			logger.error("No data to average")
+			raise ValueError("No data to average")
+		ctr = np.arange(1, len(volume) + 1)
+		self.rolling_avg_price = np.cumsum((high + low) / 2) / ctr
+		self.rolling_avg_vol = np.cumsum(volume) / ctr
+		self.avg_vol = float(self.rolling_avg_vol[-1])
 		logger.info(f"Average volume: {self.avg_vol}")
-		self.avg_price = total_p / ctr
+		self.avg_price = float(self.rolling_avg_price[-1])
 		logger.info(f"Average price: {self.avg_price}")
 
 	def analyze(self):
@@ -104,14 +140,14 @@ class AverageAnalyzer(BaseAnalyzer):
 		self.result = {
 			"avg_vol":self.avg_vol,
 			"avg_price":self.avg_price,
-			"rolling_avg_vol":tuple(self.rolling_avg_vol),
-			"rolling_avg_price":tuple(self.rolling_avg_price)
+			"rolling_avg_vol":self.rolling_avg_vol,
+			"rolling_avg_price":self.rolling_avg_price
 		}
 
 	def verifyData(self):
-		"""Data type check for pandas DataFrame data"""
+		"""Data type check for pandas DataFrame or column mapping data"""
 		datatype = type(self.data)
-		if datatype is not pandas.core.frame.DataFrame:
+		if not is_candles(self.data):
 			logger.error(f"Wrong analysis data type {datatype}")
 			raise ValueError(f"Wrong analysis data type {datatype}")
 		else:
@@ -122,7 +158,7 @@ class RisingEdgeAnalyzer(BaseAnalyzer):
 	""" Rising edge analyzer
 	
 	Finds number of rising edges of wanted gain magnitude and
-	returns a tuple of possible entry points (days).
+	returns an array of possible entry points (days).
 
 	Attributes:
 		data: data to analyze
@@ -135,50 +171,54 @@ class RisingEdgeAnalyzer(BaseAnalyzer):
 		self.period_days = period_days
 
 	def verifyData(self):
-		"""Data type check for pandas DataFrame data"""
+		"""Data type check for pandas DataFrame or column mapping data"""
 		datatype = type(self.data)
-		if datatype is not pandas.core.frame.DataFrame:
+		if not is_candles(self.data):
 			logger.error(f"Wrong analysis data type {datatype}")
 			raise ValueError(f"Wrong analysis data type {datatype}")
 		else:
 			logger.info("RisingEdge analysis data type verified")
 
-	def getGains(self) -> tuple:
+	def getGains(self) -> np.ndarray:
 		"""Return % gains for each candlestick in provided data"""
-		total_gains = []
-		for _,day in self.data.iterrows():
-			gains = day["Close"] / day["Open"]
-			gains = self.getPercent(gains)
-			total_gains.append(gains)
+		open_p, close_p = self.getColumns("Open", "Close")
+		total_gains = self.getPercent(close_p / open_p)
 		logger.info(f"Gains:")
 		logger.info(total_gains)
-		return tuple(total_gains)
+		return total_gains
 
-	def getIntTreshGain(self):
+	def getIntTreshGain(self) -> np.ndarray:
 		"""Returns total occurrencies where treshold gains happened intra-day"""
-		total_gains = []
-		for idx, day in self.data.iterrows():
-			high_sell = day["High"] / day["Open"]
-			low_sell = day["Close"] / day["Low"]
-			intraday_gain = max(high_sell, low_sell)
-			intraday_gain = self.getPercent(intraday_gain)
-			if intraday_gain >= self.wanted_gain:
-				total_gains.append(int(intraday_gain // self.wanted_gain))
-			else:
-				total_gains.append(0)
+		total_gains = self.countIntradayGains(self.getIntradayGains())
 		logger.info(f"Intraday gains:")
 		logger.info(total_gains)
-		return tuple(total_gains)
+		return total_gains
+
+	def getIntradayGains(self) -> np.ndarray:
+		"""Return best % gain reachable within each candlestick"""
+		open_p, high, low, close_p = self.getColumns("Open", "High", "Low", "Close")
+		return self.getPercent(np.maximum(high / open_p, close_p / low))
+
+	def countIntradayGains(self, intraday_gain:np.ndarray) -> np.ndarray:
+		"""Return how many times wanted gain fits in each intra-day gain"""
+		return np.where(
+			intraday_gain >= self.wanted_gain,
+			np.floor_divide(intraday_gain, self.wanted_gain),
+			0
+		).astype(int)
 
 	def getPercent(self, gains):
-		"""Returns percent"""
-		if gains > 1:
-			return (gains * 100) - 100
-		else:
-			return -1 * (1 - gains) * 100
+		"""Returns percent, works on scalars and arrays"""
+		gains = np.asarray(gains, dtype=float)
+		percent = np.where(gains > 1, (gains * 100) - 100, -1 * (1 - gains) * 100)
+		return percent if percent.ndim else float(percent)
+
+	def countGainsReference(self, gains:tuple, intraday:tuple=None):
+		"""Calculate gains possibility for each entry point (reference loop)
 
-	def countGains(self, gains:tuple, intraday:tuple=None):
-		"""Calculate gains possibility for each entry point"""
+		Kept as the reference implementation for countGains, runs in
+		O(n*period_days).
+		"""
 		tmp_gains = [0 for _ in range(len(gains))]
 		gains_counter = [0 for _ in range(len(gains))]
 		for i in range(len(gains)):
@@ -192,41 +232,123 @@ class RisingEdgeAnalyzer(BaseAnalyzer):
 					tmp_gains[j] -= self.wanted_gain
 		return tuple(gains_counter)
 
+	def countGains(self, gains:np.ndarray, intraday:np.ndarray=None) -> np.ndarray:
+		"""Calculate gains possibility for each entry point
+
+		While every single gain in its window is below wanted_gain an entry
+		point never carries more than wanted_gain over to the next day, so its
+		count is the best running sum in its window floored by wanted_gain.
+		Best running sums come from prefix sums and a sliding maximum, in
+		linear time. Entry points whose window holds a gain of at least
+		wanted_gain or a non-finite gain are stepped with the reference
+		arithmetic instead, which costs O(period_days) each. With wanted gains
+		below common daily moves, e.g. 1 or 2%, that is most entry points and
+		the count runs in O(n*period_days). Sums landing exactly on a
+		threshold are recounted step by step, so results match
+		countGainsReference.
+		"""
+		gains = np.asarray(gains, dtype=float)
+		n = len(gains)
+		if n == 0 or self.period_days <= 0:
+			return np.zeros(n, dtype=int)
+		if self.wanted_gain <= 0:
+			return self.countGainsStepped(gains)
+		window = min(self.period_days, n)
+		unsafe = ~(np.isfinite(gains) & (gains < self.wanted_gain))
+		if not unsafe.any():
+			prefix = np.concatenate(([0.0], np.cumsum(gains)))
+			return self.countFromBest(gains, prefix, sliding_max(prefix[1:], window))
+
+		# Entry points with an unsafe gain anywhere in their window
+		unsafe_before = np.concatenate(([0], np.cumsum(unsafe)))
+		stepped = np.flatnonzero(unsafe_before[np.minimum(np.arange(n) + window, n)] > unsafe_before[:-1])
+		safe_gains = np.where(unsafe, 0.0, gains)
+		prefix = np.concatenate(([0.0], np.cumsum(safe_gains)))
+		counter = self.countFromBest(safe_gains, prefix, sliding_max(prefix[1:], window))
+		# Stepped entry points come in runs, each run is stepped on contiguous slices
+		breaks = np.flatnonzero(np.diff(stepped) > 1)
+		for first, last in zip(stepped[np.concatenate(([0], breaks + 1))], stepped[np.concatenate((breaks, [-1]))]):
+			counter[first:last + 1] = self.countGainsStepped(gains, first, last + 1)
+		return counter
+
+	def countFromBest(self, gains:np.ndarray, prefix:np.ndarray, best:np.ndarray) -> np.ndarray:
+		"""Count gains from prefix sums and best prefix sum in each window
+
+		Only valid while every single gain is below wanted_gain. best does not
+		depend on wanted_gain, so it can be shared between wanted gains.
+		"""
+		window = min(self.period_days, len(gains))
+		ratio = (best - prefix[:-1]) / self.wanted_gain
+		counter = np.maximum(np.floor(ratio), 0).astype(int)
+		# Sums landing on a threshold may round differently than the
+		# step-by-step accumulation, recount those entry points exactly
+		nearest = np.round(ratio)
+		ties = np.flatnonzero((nearest >= 1) & (np.abs(ratio - nearest) < 1e-9 * nearest))
+		for j in ties:
+			counter[j] = self.countEntryGains(gains[j:j + window])
+		return counter
+
+	def countEntryGains(self, gains:np.ndarray) -> int:
+		"""Count gains for a single entry point, same arithmetic as the reference loop"""
+		tmp_gain = 0
+		counter = 0
+		for gain in gains.tolist():
+			tmp_gain += gain
+			if tmp_gain >= self.wanted_gain:
+				counter += 1
+				tmp_gain -= self.wanted_gain
+		return counter
+
+	def countGainsStepped(self, gains:np.ndarray, start:int=0, stop:int=None) -> np.ndarray:
+		"""Step entry points start to stop together, one vectorized pass per window offset"""
+		n = len(gains)
+		stop = n if stop is None else stop
+		tmp_gains = np.zeros(stop - start)
+		gains_counter = np.zeros(stop - start, dtype=int)
+		for offset in range(min(self.period_days, n)):
+			active = min(stop, n - offset) - start
+			if active <= 0:
+				break
+			tmp_gains[:active] += gains[start + offset:start + offset + active]
+			hit = tmp_gains[:active] >= self.wanted_gain
+			gains_counter[:active] += hit
+			tmp_gains[:active][hit] -= self.wanted_gain
+		return gains_counter
+
 	def analyze(self):
 		"""Main function"""
 		gains_list = self.getGains()
 		counted_gains = self.countGains(gains_list)
 		intraday = self.getIntTreshGain()
-		self.result = tuple([x + y for x,y in zip(counted_gains, intraday)])
+		self.result = counted_gains + intraday
 
 
 class RollingPriceAnalyzer(BaseAnalyzer):
 	"""Rolling price analyzer
 
-	Returns tuple of open_price@date/ravg_price@date
+	Returns array of open_price@date/ravg_price@date
 	
 	Attributes:
 		data: data for analysis
 		rolling_price_avgs: rolling price averages
 	"""
-	def __init__(self, data, rolling_price_avgs:tuple):
+	def __init__(self, data, rolling_price_avgs:np.ndarray):
 		super().__init__(data)
 		self.averages = rolling_price_avgs
 		tavg = type(self.averages)
-		if tavg is not tuple:
+		if tavg is not np.ndarray and tavg is not tuple:
 			logger.error(f"Wrong analysis rolling_price_avgs type {tavg}")
 			raise ValueError(f"Wrong analysis rolling_price_avgs type {tavg}")
 
 	def analyze(self):
 		"""Analyze data"""
-		open_prices = tuple(self.data["Open"].tolist())
-		tmp = [x/y for x,y in zip(open_prices, self.averages)]
-		self.result = tuple(tmp)
+		open_prices, = self.getColumns("Open")
+		self.result = open_prices / np.asarray(self.averages, dtype=float)
 
 	def verifyData(self):
-		"""Data type check for pandas DataFrame data"""
+		"""Data type check for pandas DataFrame or column mapping data"""
 		datatype = type(self.data)
-		if datatype is not pandas.core.frame.DataFrame:
+		if not is_candles(self.data):
 			logger.error(f"Wrong analysis data type {datatype}")
 			raise ValueError(f"Wrong analysis data type {datatype}")
 		else:
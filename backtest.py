@@ -0,0 +1,175 @@
+import csv
+import logging
+import numpy as np
+from analyzer import RisingEdgeAnalyzer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+def first_reach(values, targets, starts, limits) -> np.ndarray:
+	"""Return first k in [starts[j], limits[j]) with values[k] >= targets[j], limits[j] if none
+
+	All queries are answered together by binary lifting over a sparse table
+	of block maxima, O(n log n) for n values and queries.
+	"""
+	values = np.asarray(values, dtype=float)
+	pos = np.array(starts, dtype=int)
+	limits = np.asarray(limits, dtype=int)
+	targets = np.asarray(targets, dtype=float)
+	# table[level][i] = max(values[i:i + 2**level])
+	table = [values]
+	while 2 ** len(table) <= len(values):
+		half = 2 ** (len(table) - 1)
+		table.append(np.maximum(table[-1][:-half], table[-1][half:]))
+	for level in range(len(table) - 1, -1, -1):
+		step = 2 ** level
+		fits = np.flatnonzero(pos + step <= limits)
+		below = table[level][pos[fits]] < targets[fits]
+		pos[fits[below]] += step
+	return pos
+
+
+class WalkForwardBacktest:
+	"""Walk-forward rising edge risk backtest
+
+	Slides the sampling window across history one candle at a time. For
+	every window end the rising edge risk is predicted from the window's
+	candles only, then compared against whether an entry at the next
+	candle reached wanted gain within period_days.
+
+	An entry point fails in a window exactly when it reaches no gain
+	before the window ends, which only depends on the candle where it
+	first reaches wanted gain. First hits are found once for all entry
+	points from prefix sums, then every window's failures are counted
+	from a difference array, so all windows together cost O(n log n).
+
+	Attributes:
+		data: candle data, oldest first
+		wanted_gain: % gain wanted
+		period_days: number of days in a period
+		lookback_days: calendar days in a sampling window
+		ends: index of the first candle after each window
+		risk: predicted risk of each window
+		realized: 1 if entry at the window end reached wanted gain, 0 if not
+	"""
+	def __init__(self, data, wanted_gain, period_days:int, lookback_days:int):
+		self.data = data
+		self.wanted_gain = wanted_gain
+		self.period_days = period_days
+		self.lookback_days = lookback_days
+		self.ends = None
+		self.risk = None
+		self.realized = None
+
+	def firstHits(self, gains:np.ndarray, intraday:np.ndarray) -> np.ndarray:
+		"""Return index of the candle where each entry point first reaches wanted gain, n if never
+
+		Gains are compared as prefix sum differences, entry points whose sums
+		land within rounding of the threshold or whose period holds a
+		non-finite gain are rechecked step by step with the reference
+		arithmetic.
+		"""
+		n = len(gains)
+		starts = np.arange(n)
+		limits = np.minimum(starts + max(self.period_days, 0), n)
+		# A NaN or infinite gain would carry into every later prefix sum
+		finite = np.isfinite(gains)
+		prefix = np.concatenate(([0.0], np.cumsum(np.where(finite, gains, 0.0))))
+		tolerance = 1e-9 * max(1.0, float(np.abs(prefix).max()))
+		targets = prefix[:-1] + self.wanted_gain
+		low = first_reach(prefix[1:], targets - tolerance, starts, limits)
+		high = first_reach(prefix[1:], targets + tolerance, starts, limits)
+		hits = np.where(high < limits, high, n)
+		non_finite_before = np.concatenate(([0], np.cumsum(~finite)))
+		stepped = (low != high) | (non_finite_before[limits] > non_finite_before[starts])
+		for j in np.flatnonzero(stepped):
+			hits[j] = self.firstHitStepped(gains, j, limits[j])
+		# A wanted intra-day gain is a hit on the entry candle itself
+		hits[intraday > 0] = starts[intraday > 0]
+		return hits
+
+	def firstHitStepped(self, gains:np.ndarray, start:int, limit:int) -> int:
+		"""Return first hit of one entry point with the reference arithmetic, len(gains) if never"""
+		tmp_gain = 0
+		for k in range(start, limit):
+			tmp_gain += gains[k]
+			if tmp_gain >= self.wanted_gain:
+				return k
+		return len(gains)
+
+	def calculate(self):
+		"""Predict risk and realize outcome for every window"""
+		an = RisingEdgeAnalyzer(self.data, self.wanted_gain, self.period_days)
+		gains = an.getGains()
+		n = len(gains)
+		if n == 0:
+			logger.error("No data to backtest")
+			raise ValueError("No data to backtest")
+		intraday = an.countIntradayGains(an.getIntradayGains())
+		hits = self.firstHits(gains, intraday)
+
+		# Window ending before candle e starts at the first candle inside lookback
+		dates = np.asarray(self.data.index).astype("datetime64[D]")
+		window_starts = np.searchsorted(dates, dates - np.timedelta64(self.lookback_days, "D"))
+		ends = np.arange(n)
+		full = (dates - np.timedelta64(self.lookback_days, "D") >= dates[0]) & (window_starts < ends)
+
+		# Entry j fails in windows ending at e with j < e <= hits[j], and
+		# belongs to windows while e <= last_end[j], the last end starting at or before j
+		last_end = np.searchsorted(window_starts, np.arange(n), side="right") - 1
+		until = np.minimum(hits, last_end)
+		failed = np.zeros(n + 1, dtype=int)
+		np.add.at(failed, np.arange(1, n + 1)[until >= ends + 1], 1)
+		np.add.at(failed, until[until >= ends + 1] + 1, -1)
+		failed = np.cumsum(failed)[:n]
+
+		# Outcome is known when the entry hit or its full period is in the data
+		known = (hits < n) | (ends + self.period_days <= n)
+		valid = np.flatnonzero(full & known)
+		self.ends = valid
+		self.risk = failed[valid] / (valid - window_starts[valid]) * 100
+		self.realized = (hits[valid] < n).astype(int)
+		logger.info(f"Backtested {len(valid)} windows")
+
+	def getRisk(self) -> np.ndarray:
+		"""Return predicted risk of every backtested window"""
+		if self.risk is None:
+			logger.error("No backtest calculated")
+			raise ValueError("No backtest calculated")
+		return self.risk
+
+	def calibration(self, buckets:int) -> list:
+		"""Return [(risk_low, risk_high, windows, predicted_risk, realized_risk)] per risk bucket
+
+		predicted_risk is the mean predicted risk and realized_risk the % of
+		entries that failed, both in % and None for empty buckets.
+		"""
+		risk = self.getRisk()
+		width = 100 / buckets
+		bucket = np.minimum((risk // width).astype(int), buckets - 1)
+		windows = np.bincount(bucket, minlength=buckets)
+		predicted = np.bincount(bucket, weights=risk, minlength=buckets)
+		realized = np.bincount(bucket, weights=1 - self.realized, minlength=buckets) * 100
+		rows = []
+		for b in range(buckets):
+			count = int(windows[b])
+			rows.append((
+				b * width, (b + 1) * width, count,
+				float(predicted[b] / count) if count else None,
+				float(realized[b] / count) if count else None
+			))
+		return rows
+
+
+def write_calibration(filename, backtests:dict, buckets:int):
+	"""Write ticker -> WalkForwardBacktest mapping as a ticker x risk bucket calibration CSV table"""
+	with open(filename, "w", newline="") as f:
+		writer = csv.writer(f)
+		writer.writerow(("ticker", "risk_low", "risk_high", "windows", "predicted_risk", "realized_risk"))
+		for ticker, backtest in backtests.items():
+			for low, high, count, predicted, realized in backtest.calibration(buckets):
+				writer.writerow((
+					ticker, round(low, 2), round(high, 2), count,
+					None if predicted is None else round(predicted, 4),
+					None if realized is None else round(realized, 4)
+				))
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+""" Analyzer benchmark.
+
+Runs analyzers and risk calculators offline on seeded synthetic candles
+and reports throughput, peak memory and per-stage timings as JSON.
+Optionally compares the run against a saved baseline.
+"""
+import sys
+import os
+import json
+import time
+import subprocess
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+import pandas as pd
+from daterange import DateRange
+from analyzer import Analyzer
+from risk_calculator import RiskCalculator
+
+LENGTHS = (100, 1000, 10000, 100000)
+PERIODS = ("1d", "1w", "1m", "1y")
+# CLI import time budget in seconds, heavy modules must not load at startup
+STARTUP_BUDGET = 0.5
+HEAVY_MODULES = ("pandas", "yfinance")
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import stockhunter
+print(time.perf_counter() - start, *[module for module in {heavy} if module in sys.modules])
+"""
+
+def generate_candles(n:int, seed:int=0, start="1990-01-01") -> pd.DataFrame:
+	"""Generate n synthetic daily candles with gaps, flat days and spikes"""
+	rng = np.random.default_rng(seed)
+	# Business days with ~2% of dates missing
+	dates = pd.bdate_range(start, periods=int(n * 1.03) + 10)
+	dates = dates[np.sort(rng.choice(len(dates), size=n, replace=False))]
+
+	returns = rng.normal(0.0003, 0.015, n)
+	spikes = rng.random(n) < 0.005
+	returns[spikes] += rng.choice((-1, 1), spikes.sum()) * rng.uniform(0.1, 0.3, spikes.sum())
+	close = 50 * np.exp(np.cumsum(returns))
+	open_p = close * np.exp(rng.normal(0, 0.008, n))
+	high = np.maximum(open_p, close) * (1 + rng.exponential(0.006, n))
+	low = np.minimum(open_p, close) * (1 - rng.exponential(0.006, n))
+	volume = rng.lognormal(13, 0.5, n).round()
+
+	flat = rng.random(n) < 0.01
+	open_p[flat] = high[flat] = low[flat] = close[flat]
+	volume[flat] = 0
+	return pd.DataFrame({"Open":open_p, "High":high, "Low":low, "Close":close, "Volume":volume}, index=dates)
+
+def run_case(data, gains:int, period_days:int) -> dict:
+	"""Run every stage once, return per-stage seconds"""
+	timings = {}
+
+	def stage(name, func):
+		start = time.perf_counter()
+		try:
+			result = func()
+		except ValueError:
+			# e.g. no winning entry point for the entry risk
+			result = None
+		timings[name] = time.perf_counter() - start
+		return result
+
+	def analyze(atype, **kwargs):
+		an = Analyzer(atype, data, **kwargs)
+		an.analyze()
+		return an.getResult()
+
+	def risk(rtype, analysis_data):
+		rc = RiskCalculator(rtype, analysis_data)
+		rc.calculateRisk()
+		return rc.getRisk()
+
+	rising_edge = stage("rising_edge", lambda: analyze("re", wanted_gain=gains, period_days=period_days))
+	averages = stage("averages", lambda: analyze("avg"))
+	ratios = stage("rolling_price", lambda: analyze("rpa", averages=averages["rolling_avg_price"]))
+	stage("re_risk", lambda: risk("re", rising_edge))
+	entry_data = {
+		"ticker":"SYNTH",
+		"avg_price":averages["avg_price"],
+		"rising_edge_data":rising_edge,
+		"price_avg_ratios":ratios,
+		"current_price":float(data["Close"].iloc[-1])
+	}
+	stage("entry_risk", lambda: risk("per", entry_data))
+	return timings
+
+def benchmark(lengths, periods, gains:int, repeat:int, seed:int) -> list:
+	"""Benchmark every length/period combination"""
+	cases = []
+	for n in lengths:
+		data = generate_candles(n, seed)
+		for period in periods:
+			period_days = DateRange.periodToDays(period)
+			best = None
+			for _ in range(repeat):
+				timings = run_case(data, gains, period_days)
+				if best is None or sum(timings.values()) < sum(best.values()):
+					best = timings
+
+			tracemalloc.start()
+			run_case(data, gains, period_days)
+			_, peak = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+
+			total = sum(best.values())
+			case = {
+				"name":f"n={n},period={period}",
+				"candles":n,
+				"period":period,
+				"seconds":total,
+				"candles_per_sec":n / total if total else None,
+				"peak_bytes":peak,
+				"stages":best
+			}
+			print(f"{case['name']:<24} {total * 1000:10.2f} ms {case['candles_per_sec']:14.0f} candles/s {peak / 2**20:8.2f} MiB")
+			cases.append(case)
+	return cases
+
+def startup(repeat:int) -> dict:
+	"""Measure stockhunter import time in fresh interpreters, fastest run is reported"""
+	script = STARTUP_SCRIPT.format(heavy=HEAVY_MODULES)
+	directory = os.path.dirname(os.path.abspath(__file__))
+	best, loaded = None, []
+	for _ in range(repeat):
+		output = subprocess.run(
+			[sys.executable, "-c", script], cwd=directory, capture_output=True, text=True, check=True
+		).stdout.split()
+		seconds, loaded = float(output[0]), output[1:]
+		best = seconds if best is None else min(best, seconds)
+	print(f"{'startup':<24} {best * 1000:10.2f} ms, heavy modules loaded: {', '.join(loaded) or 'none'}")
+	return {"seconds":best, "heavy_modules":loaded}
+
+def compare(cases, baseline, tolerance:float) -> list:
+	"""Return names of cases slower than baseline by more than tolerance"""
+	previous = {case["name"]: case for case in baseline["cases"]}
+	regressions = []
+	for case in cases:
+		old = previous.get(case["name"])
+		if old is None:
+			continue
+		ratio = case["seconds"] / old["seconds"] if old["seconds"] else 1
+		print(f"{case['name']:<24} {ratio:6.2f}x baseline time")
+		if ratio > 1 + tolerance:
+			regressions.append(case["name"])
+	return regressions
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-n", "--lengths", type=str, help="comma separated history lengths", default=",".join(map(str, LENGTHS)))
+	parser.add_argument("-p", "--periods", type=str, help="comma separated periods", default=",".join(PERIODS))
+	parser.add_argument("-g", "--gains", type=int, help="%% gains", default=5)
+	parser.add_argument("-r", "--repeat", type=int, help="runs per case, fastest is reported", default=3)
+	parser.add_argument("-s", "--seed", type=int, help="synthetic data seed", default=0)
+	parser.add_argument("-o", "--output", type=str, help="JSON results file", default="benchmark.json")
+	parser.add_argument("-b", "--baseline", type=str, help="baseline JSON results file to compare against")
+	parser.add_argument("--tolerance", type=float, help="allowed slowdown against baseline", default=0.2)
+	parser.add_argument("--startup-budget", type=float, help="max seconds to import the CLI", default=STARTUP_BUDGET)
+	args = parser.parse_args()
+
+	lengths = [int(n) for n in args.lengths.split(",")]
+	periods = args.periods.split(",")
+	cases = benchmark(lengths, periods, args.gains, args.repeat, args.seed)
+	startup_time = startup(args.repeat)
+	report = {
+		"python":platform.python_version(),
+		"numpy":np.__version__,
+		"pandas":pd.__version__,
+		"gains":args.gains,
+		"seed":args.seed,
+		"startup":startup_time,
+		"cases":cases
+	}
+	with open(args.output, "w") as f:
+		json.dump(report, f, indent=1)
+	print(f"Results written to {args.output}")
+
+	if startup_time["heavy_modules"] or startup_time["seconds"] > args.startup_budget:
+		print(f"Startup over budget of {args.startup_budget}s or loads {', '.join(HEAVY_MODULES)}")
+		sys.exit(1)
+
+	if args.baseline:
+		with open(args.baseline, "r") as f:
+			baseline = json.load(f)
+		regressions = compare(cases, baseline, args.tolerance)
+		if regressions:
+			print(f"Regressions: {', '.join(regressions)}")
+			sys.exit(1)
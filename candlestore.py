@@ -0,0 +1,80 @@
+import os
+import logging
+import datetime
+import tempfile
+import numpy as np
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+def normalize_candles(data):
+	"""Return candle data with flat OHLCV columns and a date index
+
+	data may also be a field -> column mapping with an index attribute,
+	e.g. a CandleView of the file collector.
+	"""
+	import pandas as pd
+	if data is None or len(data) == 0:
+		return pd.DataFrame(columns=list(FIELDS), index=pd.DatetimeIndex([], name="Date"))
+	if isinstance(data, Mapping):
+		index = pd.DatetimeIndex(np.asarray(data.index).astype("datetime64[ns]"), name="Date")
+		data = pd.DataFrame({field: np.asarray(data[field]) for field in FIELDS if field in data}, index=index)
+	if data.columns.nlevels > 1:
+		data = data.copy()
+		data.columns = data.columns.get_level_values(0)
+	data = data[[field for field in FIELDS if field in data.columns]]
+	data.index = pd.DatetimeIndex(data.index).tz_localize(None).normalize()
+	return data
+
+class CandleStore:
+	"""On-disk candle store
+
+	Keeps one compressed .npz file per ticker holding a day-resolution date
+	column, one float column per OHLCV field and the date range that was
+	already requested from the data provider.
+
+	Attributes:
+		path: store directory
+	"""
+	def __init__(self, path):
+		self.path = path
+		os.makedirs(self.path, exist_ok=True)
+
+	def tickerPath(self, ticker) -> str:
+		"""Return file path used for a given ticker"""
+		return os.path.join(self.path, ticker.replace(os.sep, "_") + ".npz")
+
+	def load(self, ticker) -> tuple:
+		"""Return (candles, covered_start, covered_end) or None if ticker is not stored"""
+		path = self.tickerPath(ticker)
+		if not os.path.exists(path):
+			return None
+		import pandas as pd
+		with np.load(path) as stored:
+			index = pd.DatetimeIndex(stored["dates"].astype("datetime64[ns]"), name="Date")
+			data = pd.DataFrame({field: stored[field] for field in FIELDS}, index=index)
+			covered_start, covered_end = stored["covered"].tolist()
+		logger.info(f"loaded {len(data)} cached candles for {ticker}")
+		return data, covered_start, covered_end
+
+	def save(self, ticker, data, covered_start:datetime.date, covered_end:datetime.date):
+		"""Atomically write candles and covered date range for a ticker"""
+		data = normalize_candles(data)
+		columns = {field: np.ascontiguousarray(data[field], dtype=float) for field in FIELDS}
+		fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "wb") as f:
+				np.savez_compressed(
+					f,
+					dates=data.index.values.astype("datetime64[D]"),
+					covered=np.array([covered_start, covered_end], dtype="datetime64[D]"),
+					**columns
+				)
+			os.replace(tmp_path, self.tickerPath(ticker))
+		except:
+			os.remove(tmp_path)
+			raise
+		logger.info(f"stored {len(data)} candles for {ticker}")
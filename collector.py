@@ -1,10 +1,43 @@
-import yfinance as yf
+import os
+import json
 import logging
+import time
+import queue
+import asyncio
+import threading
+import numpy as np
 from abc import ABC, abstractmethod, abstractstaticmethod
+from candlestore import CandleStore, FIELDS, normalize_candles
+from universestore import CandleView
+from fundamentals import default_cache
+from ratelimit import TokenBucket, retry
+from instrumentation import default_instrumentation
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+metrics = default_instrumentation()
+
+def yahoo_download(*args, **kwargs):
+	"""yf.download, importing yfinance on first use"""
+	import yfinance as yf
+	return yf.download(*args, **kwargs)
+
+def count_download(data):
+	"""Count downloaded rows and bytes"""
+	metrics.count("rows_downloaded", len(data))
+	metrics.count("bytes_downloaded", int(data.memory_usage(deep=True).sum()))
+
+def split_ticker(data, ticker):
+	"""Return a single ticker's columns from a multi-ticker download"""
+	if data.columns.nlevels == 1:
+		return data
+	if ticker in data.columns.get_level_values(0):
+		return data[ticker]
+	if ticker in data.columns.get_level_values(1):
+		return data.xs(ticker, axis=1, level=1)
+	raise ValueError(f"No data downloaded for {ticker}")
+
 class Collector:
 	""" Collector wrapper class
 	
@@ -14,12 +47,37 @@ class Collector:
 		ctype: collector type
 		start_date: start date
 		end_date: end date
+		batch_size: number of tickers fetched per call in getDataBatch
+		sleep: seconds to wait before each network call in getDataBatch
 		col: collector instance
 	"""
-	def __init__(self, ctype, start_date, end_date):
+	def __init__(self, ctype, start_date, end_date, **kwargs):
+		self.start_date = start_date
+		self.end_date = end_date
+		self.batch_size = int(kwargs.pop("batch_size", 1))
+		self.sleep = kwargs.pop("sleep", 0)
 		if ctype == "yahoo":
-			self.col = YahooCollector(start_date, end_date)
+			store = kwargs.pop("store", None)
+			offline = kwargs.pop("offline", False)
+			download = kwargs.pop("download", None)
+			self.col = YahooCollector(start_date, end_date, store, offline, download)
 			logger.info("initialized yahoo collector")
+		elif ctype == "yahoo-async":
+			store = kwargs.pop("store", None)
+			offline = kwargs.pop("offline", False)
+			download = kwargs.pop("download", None)
+			rate = kwargs.pop("rate", 2)
+			concurrency = kwargs.pop("concurrency", 4)
+			retries = kwargs.pop("retries", 3)
+			self.col = AsyncYahooCollector(start_date, end_date, store, offline, download, rate, concurrency, retries)
+			logger.info("initialized async yahoo collector")
+		elif ctype == "file":
+			path = kwargs.pop("path")
+			fundamentals_file = kwargs.pop("fundamentals_file", None)
+			self.col = FileCollector(start_date, end_date, path, fundamentals_file)
+			# Local reads need no throttling
+			self.sleep = 0
+			logger.info("initialized file collector")
 		else:
 			logger.error("Unvalid collector type provided")
 			raise ValueError("Unvalid collector type")
@@ -28,6 +86,21 @@ class Collector:
 		"""Returns OHLC candle data for a given ticker"""
 		return self.col.getCandleData(ticker)
 
+	def getPrice(self, ticker):
+		"""Returns current price for a given ticker"""
+		return self.col.getPrice(ticker)
+
+	def getVolume(self, ticker):
+		"""Returns current volume for a given ticker"""
+		return self.col.getVolume(ticker)
+
+	def getDataBatch(self, tickers):
+		"""Yield (ticker, data, error) tuples as chunks of tickers are fetched
+
+		error is None on success, data is None when fetching the ticker failed.
+		"""
+		return self.col.getCandleDataBatch(tuple(tickers), self.batch_size, self.sleep)
+
 
 class BaseCollector(ABC):
 	"""Collector base class for inheritance
@@ -53,28 +126,361 @@ class BaseCollector(ABC):
 		"""Get candle data in given period for a given ticker"""
 		pass
 
+	def getCandleDataBatch(self, tickers, batch_size:int, sleep:float=0):
+		"""Yield (ticker, data, error) for each ticker, one ticker at a time"""
+		for ticker in tickers:
+			with metrics.stage("sleep"):
+				time.sleep(sleep)
+			try:
+				yield ticker, self.getCandleData(ticker), None
+			except Exception as e:
+				logger.error(f"Failed to collect {ticker}: {e}")
+				yield ticker, None, e
+
 
 class YahooCollector(BaseCollector):
 	"""Yahoo collector
 
-	Collect candlestick data using yahoo finance API
+	Collect candlestick data using yahoo finance API. When a candle store
+	is given, candles are served from it and only the missing tail is
+	downloaded, starting at the last stored candle. A window starting
+	before the stored range is downloaded whole. If the refetched last
+	candle shows prices were adjusted since they were stored, the whole
+	window is downloaded again and replaces the stored candles.
+
+	Attributes:
+		store: CandleStore instance or None
+		offline: serve only from the store, never download
+		download: download function with yf.download signature
 	"""
-	def __init__(self, start_date, end_date):
+	def __init__(self, start_date, end_date, store:CandleStore=None, offline=False, download=None):
 		super().__init__(start_date, end_date)
+		self.store = store
+		self.offline = offline
+		self.download = download if download is not None else yahoo_download
+		if self.offline and self.store is None:
+			logger.error("Offline mode requires a candle store")
+			raise ValueError("Offline mode requires a candle store")
+
+	def fetch(self, ticker, start_date, end_date):
+		"""Download candles in [start_date, end_date)"""
+		logger.info(f"fetching data for {ticker} starting {start_date} ending {end_date}")
+		with metrics.stage("download"):
+			data = self.download(ticker, start=start_date, end=end_date, progress=False)
+		count_download(data)
+		return normalize_candles(data)
+
+	def loadCached(self, ticker):
+		"""Return cached (candles, covered_start, covered_end) or None"""
+		if self.store is None:
+			return None
+		cached = self.store.load(ticker)
+		if self.offline and cached is None:
+			logger.error(f"No cached data for {ticker}")
+			raise ValueError(f"No cached data for {ticker}")
+		return cached
+
+	def missingStart(self, cached):
+		"""Return date to download from, or None if the cache covers the window"""
+		fetch_start = self.firstMissingDate(cached)
+		metrics.count("candle_cache_hits" if fetch_start is None else "candle_cache_misses")
+		return fetch_start
+
+	def firstMissingDate(self, cached):
+		"""Return first date to download from, or None if the cache covers the window
+
+		A missing head is not fetched on its own, the whole window is
+		downloaded in one request instead.
+		"""
+		if self.offline:
+			return None
+		if cached is None:
+			return self.start_date
+		data, covered_start, covered_end = cached
+		if self.start_date < covered_start:
+			return self.start_date
+		# Refetch the last stored candle, it may have been incomplete
+		tail_start = data.index[-1].date() if len(data) else covered_end
+		tail_start = min(tail_start, covered_end)
+		if tail_start < self.end_date:
+			return tail_start
+		return None
+
+	def isRescaled(self, cached, fetched) -> bool:
+		"""Return True if prices were adjusted since the cached candles were stored
+
+		Downloads are adjusted for splits and dividends, so after one the
+		stored candles are in an older price scale. The open of the last
+		stored candle is final even when the candle was not, so a refetched
+		open that differs from the stored one means adjusted prices.
+		"""
+		if cached is None or len(cached[0]) == 0 or len(fetched) == 0:
+			return False
+		data = cached[0]
+		last = data.index[-1]
+		if last not in fetched.index:
+			return False
+		stored = float(data["Open"].iloc[-1])
+		refetched = float(fetched.loc[last, "Open"])
+		if np.isclose(stored, refetched, rtol=1e-6, equal_nan=True):
+			return False
+		logger.info(f"Prices adjusted since stored, open {stored} is now {refetched}")
+		metrics.count("candle_cache_rescaled")
+		return True
+
+	def update(self, ticker, cached, fetched):
+		"""Merge fetched candles into cached ones, store and return the window"""
+		if cached is None:
+			data = fetched
+			covered_start, covered_end = self.start_date, self.end_date
+		else:
+			data, covered_start, covered_end = cached
+			if len(fetched):
+				import pandas as pd
+				data = pd.concat([part for part in (data, fetched) if len(part)])
+				data = data[~data.index.duplicated(keep="last")].sort_index()
+			covered_start = min(covered_start, self.start_date)
+			covered_end = max(covered_end, self.end_date)
+		if self.store is not None:
+			self.store.save(ticker, data, covered_start, covered_end)
+		return self.window(data)
 
 	def getCandleData(self, ticker):
-		logger.info(f"fetching data for {ticker} starting {self.start_date} ending {self.end_date}")
-		data = yf.download(ticker, start=self.start_date, end=self.end_date)
-		return data
+		cached = self.loadCached(ticker)
+		fetch_start = self.missingStart(cached)
+		if fetch_start is None:
+			return self.window(cached[0])
+		fetched = self.fetch(ticker, fetch_start, self.end_date)
+		if self.isRescaled(cached, fetched):
+			cached, fetched = None, self.fetch(ticker, self.start_date, self.end_date)
+		return self.update(ticker, cached, fetched)
+
+	def getCandleDataBatch(self, tickers, batch_size:int, sleep:float=0):
+		"""Fetch candles chunk by chunk, one download call per chunk"""
+		for chunk_start in range(0, len(tickers), batch_size):
+			chunk = tickers[chunk_start:chunk_start + batch_size]
+			pending = {}
+			for ticker in chunk:
+				try:
+					cached = self.loadCached(ticker)
+					fetch_start = self.missingStart(cached)
+				except Exception as e:
+					yield ticker, None, e
+					continue
+				if fetch_start is None:
+					yield ticker, self.window(cached[0]), None
+				else:
+					pending[ticker] = (cached, fetch_start)
+			if not pending:
+				continue
+
+			fetch_start = min(start for _, start in pending.values())
+			logger.info(f"fetching data for {len(pending)} tickers starting {fetch_start} ending {self.end_date}")
+			with metrics.stage("sleep"):
+				time.sleep(sleep)
+			try:
+				with metrics.stage("download"):
+					raw = self.download(list(pending), start=fetch_start, end=self.end_date, group_by="ticker", progress=False)
+				count_download(raw)
+			except Exception as e:
+				logger.error(f"Chunk download failed: {e}")
+				for ticker in pending:
+					yield ticker, None, e
+				continue
+
+			for ticker, (cached, _) in pending.items():
+				try:
+					fetched = normalize_candles(split_ticker(raw, ticker)).dropna(how="all")
+					if cached is None and len(fetched) == 0:
+						raise ValueError(f"No data downloaded for {ticker}")
+					if self.isRescaled(cached, fetched):
+						cached, fetched = None, self.fetch(ticker, self.start_date, self.end_date)
+					yield ticker, self.update(ticker, cached, fetched), None
+				except Exception as e:
+					logger.error(f"Failed to collect {ticker}: {e}")
+					yield ticker, None, e
+
+	def window(self, data):
+		"""Return candles within [start_date, end_date)"""
+		start = np.datetime64(self.start_date, "D")
+		end = np.datetime64(self.end_date, "D")
+		return data[(data.index >= start) & (data.index < end)]
 
 	@staticmethod
 	def getPrice(ticker) -> int:
-		data = yf.Ticker(ticker)
-		price = int(data.info["currentPrice"])
+		price = int(default_cache().get(ticker, "currentPrice"))
 		return price
 
 	@staticmethod
 	def getVolume(ticker) -> int:
-		data = yf.Ticker(ticker)
-		vol = int(data.info["volume"])
+		vol = int(default_cache().get(ticker, "volume"))
+		return vol
+
+
+class AsyncYahooCollector(YahooCollector):
+	"""Asyncio yahoo collector
+
+	Downloads tickers concurrently on a background event loop, throttled by
+	a token bucket instead of a fixed sleep. Failed downloads are retried
+	with exponential backoff and jitter. Cached tickers never wait for a token.
+
+	Attributes:
+		rate: requests per second
+		concurrency: max downloads in flight
+		retries: retries per ticker after the first failure
+		backoff: first retry max delay in seconds, doubled on each retry
+		max_backoff: max retry delay in seconds
+	"""
+	def __init__(self, start_date, end_date, store:CandleStore=None, offline=False, download=None,
+			rate:float=2, concurrency:int=4, retries:int=3, backoff:float=1, max_backoff:float=30):
+		super().__init__(start_date, end_date, store, offline, download)
+		self.rate = rate
+		self.concurrency = concurrency
+		self.retries = retries
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+
+	async def fetchLimited(self, bucket, ticker, start_date):
+		"""Wait for a token, then download in an executor thread"""
+		await bucket.acquire()
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(None, self.fetch, ticker, start_date, self.end_date)
+
+	async def getCandleDataAsync(self, ticker, bucket, semaphore):
+		"""Serve candles from the store, downloading the missing dates"""
+		cached = self.loadCached(ticker)
+		fetch_start = self.missingStart(cached)
+		if fetch_start is None:
+			return self.window(cached[0])
+		async with semaphore:
+			fetched = await retry(
+				lambda: self.fetchLimited(bucket, ticker, fetch_start),
+				self.retries, self.backoff, self.max_backoff
+			)
+			if self.isRescaled(cached, fetched):
+				cached = None
+				fetched = await retry(
+					lambda: self.fetchLimited(bucket, ticker, self.start_date),
+					self.retries, self.backoff, self.max_backoff
+				)
+		return self.update(ticker, cached, fetched)
+
+	async def collect(self, tickers, results:queue.Queue):
+		"""Collect all tickers, putting (ticker, data, error) on results as they finish"""
+		bucket = TokenBucket(self.rate)
+		semaphore = asyncio.Semaphore(self.concurrency)
+
+		async def collectOne(ticker):
+			try:
+				results.put((ticker, await self.getCandleDataAsync(ticker, bucket, semaphore), None))
+			except Exception as e:
+				logger.error(f"Failed to collect {ticker}: {e}")
+				results.put((ticker, None, e))
+
+		await asyncio.gather(*(collectOne(ticker) for ticker in tickers))
+
+	def getCandleDataBatch(self, tickers, batch_size:int, sleep:float=0):
+		"""Yield (ticker, data, error) in completion order while downloads continue"""
+		results = queue.Queue()
+		worker = threading.Thread(target=asyncio.run, args=(self.collect(tickers, results),), daemon=True)
+		worker.start()
+		for _ in tickers:
+			yield results.get()
+		worker.join()
+
+
+class FileCollector(BaseCollector):
+	"""Local file collector
+
+	Collects candles from a directory of per-ticker files, for offline
+	replay and backtests. Each ticker is looked up as, in order:
+		<ticker>/: directory of <field>.npy columns plus dates.npy, memory
+			mapped and sliced to the date window without copying
+		<ticker>.parquet: read with a date filter, requires pyarrow
+		<ticker>.csv: Date,Open,High,Low,Close,Volume read in chunks, only
+			rows inside the date window are kept
+	Fundamentals come from a JSON snapshot {ticker: {field: value}}.
+
+	Attributes:
+		path: data directory
+		fundamentals_file: fundamentals snapshot file
+		fundamentals: loaded snapshot
+	"""
+	CSV_CHUNK_SIZE = 50000
+
+	def __init__(self, start_date, end_date, path, fundamentals_file=None):
+		super().__init__(start_date, end_date)
+		self.path = path
+		self.fundamentals_file = fundamentals_file or os.path.join(path, "fundamentals.json")
+		self.fundamentals = None
+
+	def getCandleData(self, ticker):
+		base = os.path.join(self.path, ticker.replace(os.sep, "_"))
+		if os.path.isdir(base):
+			return self.readColumns(base)
+		if os.path.exists(base + ".parquet"):
+			return self.readParquet(base + ".parquet")
+		if os.path.exists(base + ".csv"):
+			return self.readCSV(base + ".csv")
+		logger.error(f"No data file for {ticker}")
+		raise ValueError(f"No data file for {ticker}")
+
+	def dateBounds(self) -> tuple:
+		"""Return window bounds as numpy datetime64[D]"""
+		return np.datetime64(self.start_date, "D"), np.datetime64(self.end_date, "D")
+
+	def readColumns(self, base) -> CandleView:
+		"""Memory map .npy columns and slice the date window"""
+		dates = np.load(os.path.join(base, "dates.npy"), mmap_mode="r")
+		start, end = self.dateBounds()
+		first, last = np.searchsorted(dates, start), np.searchsorted(dates, end)
+		columns = {field: np.load(os.path.join(base, field + ".npy"), mmap_mode="r")[first:last] for field in FIELDS}
+		return CandleView(dates[first:last], columns)
+
+	def readParquet(self, filename):
+		"""Read the date window of a parquet file"""
+		import pandas as pd
+		start, end = pd.Timestamp(self.start_date), pd.Timestamp(self.end_date)
+		data = pd.read_parquet(filename, filters=[("Date", ">=", start), ("Date", "<", end)])
+		if "Date" in data.columns:
+			data = data.set_index("Date")
+		return normalize_candles(data)
+
+	def readCSV(self, filename):
+		"""Read the date window of a date sorted CSV file chunk by chunk"""
+		import pandas as pd
+		start, end = pd.Timestamp(self.start_date), pd.Timestamp(self.end_date)
+		parts = []
+		for chunk in pd.read_csv(filename, parse_dates=["Date"], index_col="Date", chunksize=self.CSV_CHUNK_SIZE):
+			parts.append(chunk[(chunk.index >= start) & (chunk.index < end)])
+			if len(chunk) and chunk.index[-1] >= end:
+				break
+		return normalize_candles(pd.concat(parts) if parts else None)
+
+	@staticmethod
+	def writeColumns(path, ticker, data):
+		"""Write candles as a memory mappable .npy column directory"""
+		data = normalize_candles(data)
+		base = os.path.join(path, ticker.replace(os.sep, "_"))
+		os.makedirs(base, exist_ok=True)
+		np.save(os.path.join(base, "dates.npy"), data.index.values.astype("datetime64[D]"))
+		for field in FIELDS:
+			np.save(os.path.join(base, field + ".npy"), np.ascontiguousarray(data[field], dtype=float))
+
+	def getInfo(self, ticker) -> dict:
+		"""Return fundamentals snapshot of a ticker"""
+		if self.fundamentals is None:
+			with open(self.fundamentals_file, "r") as f:
+				self.fundamentals = json.load(f)
+		if ticker not in self.fundamentals:
+			logger.error(f"No fundamentals for {ticker}")
+			raise ValueError(f"No fundamentals for {ticker}")
+		return self.fundamentals[ticker]
+
+	def getPrice(self, ticker) -> int:
+		price = int(self.getInfo(ticker)["currentPrice"])
+		return price
+
+	def getVolume(self, ticker) -> int:
+		vol = int(self.getInfo(ticker)["volume"])
 		return vol
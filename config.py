@@ -4,4 +4,85 @@ LOG_FORMAT = "%(asctime)s:%(name)s:%(levelname)s:%(message)s"
 
 CANDIDATES_FILE = "candidates.txt"
 
-SLEEP=2
\ No newline at end of file
+SLEEP=2
+BATCH_SIZE=20
+IO_WORKERS=4
+
+# Async collector
+RATE_LIMIT=2
+MAX_CONCURRENCY=4
+RETRIES=3
+
+# Candle store
+CANDLE_STORE_DIR = "cache/candles"
+
+# Fundamentals cache, TTLs in seconds
+FUNDAMENTALS_CACHE_FILE = "cache/fundamentals.json"
+FUNDAMENTALS_CACHE_SIZE = 10000
+FUNDAMENTALS_DEFAULT_TTL = 24 * 3600
+FUNDAMENTALS_TTL = {
+	"currentPrice":15 * 60,
+	"volume":3600
+}
+
+# Sweep
+SURFACE_FILE = "risk_surface.csv"
+
+# Universe store, ticker whose trading days form the shared date index
+UNIVERSE_CALENDAR_TICKER = "SPY"
+
+# Instrumentation
+METRICS_JSON_FILE = "metrics.json"
+METRICS_PROM_FILE = "metrics.prom"
+PROFILE_FILE = "profile_{ticker}.prof"
+
+# Watch mode analysis state
+STREAM_STATE_DIR = "cache/streams"
+
+# Per-ticker results
+RESULTS_FILE = "results.csv"
+RESULTS_BUFFER_SIZE = 500
+
+# Local candle files read by the file collector
+DATA_DIR = "data"
+
+# Walk-forward backtest
+BACKTEST_HISTORY = "10y"
+BACKTEST_BUCKETS = 10
+BACKTEST_FILE = "backtest.csv"
+
+# Lookup operation filter
+LOOKUP_FILTER = {
+	"dividend":False
+}
+
+# Screening server, keeps --history of candles in memory
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_REFRESH = 3600
+
+# Scan checkpoint journal used by --resume
+JOURNAL_FILE = "cache/journal.jsonl"
+JOURNAL_SYNC_EVERY = 50
+
+# Sharded scans
+SHARD_SIZE = 100
+QUEUE_LEASE_SECONDS = 600
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_POLL = 5
+
+# Tickers per chunk in memory-bounded scans (--max-rss)
+CHUNK_SIZE = 200
+
+# Candidate ranking (--top), score = sum(weight * field), lower ranks first
+RANKING_FILE = "ranking.csv"
+RANK_WEIGHTS = {
+	"risk":1.0,
+	"entry_risk":1.0
+}
+# Score value of a missing field, e.g. entry risk without winning entry points
+RANK_MISSING_VALUE = 100
+
+# On-disk analysis result cache used with --result-cache, least recently used results evicted above RESULT_CACHE_SIZE bytes
+RESULT_CACHE_DIR = "cache/results"
+RESULT_CACHE_SIZE = 256 * 2**20
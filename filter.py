@@ -1,16 +1,145 @@
 import logging
-import yfinance as yf
+import numpy as np
+from fundamentals import default_cache
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Filter key -> fundamentals field
+FILTER_FIELDS = {
+	"dividend":"dividendRate",
+	"volume":"volume",
+	"marketcap":"marketCap"
+}
+
+PRIMITIVES = {
+	"eq":np.equal,
+	"ne":np.not_equal,
+	"gt":np.greater,
+	"lt":np.less,
+	"gte":np.greater_equal,
+	"lte":np.less_equal
+}
+
+class CompiledFilter:
+	"""Lookup filter compiled to a vectorized predicate
+
+	Takes the same filter dict as Filter.check, keys of a dict must all
+	pass. Expressions may nest {"and":[...]}, {"or":[...]} and {"not":...}.
+	The predicate runs once over a fundamentals table of the whole
+	universe, tickers missing a compared field fail the comparison.
+
+	Attributes:
+		expression: filter dict
+		fields: fundamentals fields the filter reads
+		predicate: function (table, n) returning a boolean mask
+	"""
+	def __init__(self, expression:dict):
+		self.expression = expression
+		self.fields = []
+		self.predicate = self.compile(expression)
+
+	def field(self, key) -> str:
+		"""Register a filter key's fundamentals field"""
+		field = FILTER_FIELDS[key]
+		if field not in self.fields:
+			self.fields.append(field)
+		return field
+
+	def compile(self, expression):
+		"""Return predicate of a filter expression"""
+		if isinstance(expression, (list, tuple)):
+			return self.compileAll([self.compile(part) for part in expression])
+		if not isinstance(expression, dict):
+			logger.error(f"Wrong filter expression {expression}")
+			raise ValueError(f"Wrong filter expression {expression}")
+		predicates = []
+		for key, val in expression.items():
+			if key == "and":
+				predicates.append(self.compileAll([self.compile(part) for part in val]))
+			elif key == "or":
+				predicates.append(self.compileAny([self.compile(part) for part in val]))
+			elif key == "not":
+				predicates.append(self.compileNot(self.compile(val)))
+			elif key == "dividend":
+				predicates.append(self.compileDividend(self.field(key), val))
+			elif key in FILTER_FIELDS:
+				predicates.append(self.compilePrimitives(self.field(key), val))
+			else:
+				logger.error(f"Unknown filter key {key}")
+				raise ValueError(f"Unknown filter key {key}")
+		return self.compileAll(predicates)
+
+	@staticmethod
+	def compileAll(predicates:list):
+		def predicate(table, n):
+			mask = np.ones(n, dtype=bool)
+			for part in predicates:
+				mask &= part(table, n)
+			return mask
+		return predicate
+
+	@staticmethod
+	def compileAny(predicates:list):
+		def predicate(table, n):
+			mask = np.zeros(n, dtype=bool)
+			for part in predicates:
+				mask |= part(table, n)
+			return mask
+		return predicate
+
+	@staticmethod
+	def compileNot(part):
+		return lambda table, n: ~part(table, n)
+
+	@staticmethod
+	def compileDividend(field, wanted_div:bool):
+		"""Same as Filter.dividend, a missing or zero dividend rate means no dividend"""
+		def predicate(table, n):
+			has_div = ~np.isnan(table[field]) & (table[field] != 0)
+			return has_div == bool(wanted_div)
+		return predicate
+
+	@staticmethod
+	def compilePrimitives(field, j_fil:dict):
+		"""Same as Filter.primitiveFilter, all primitives must pass"""
+		for key in j_fil:
+			if key not in PRIMITIVES:
+				logger.error(f"Unknown filter primitive {key}")
+				raise ValueError(f"Unknown filter primitive {key}")
+		def predicate(table, n):
+			values = table[field]
+			mask = ~np.isnan(values)
+			for key, val in j_fil.items():
+				mask &= PRIMITIVES[key](values, val)
+			return mask
+		return predicate
+
+	def mask(self, table:dict, n:int) -> np.ndarray:
+		"""Return boolean mask of rows of a fundamentals table passing the filter"""
+		return np.asarray(self.predicate(table, n), dtype=bool)
+
+	def select(self, tickers, fundamentals=None, workers:int=1) -> tuple:
+		"""Return tickers passing the filter, fundamentals are fetched once per ticker"""
+		tickers = tuple(tickers)
+		fundamentals = fundamentals if fundamentals is not None else default_cache()
+		table = fundamentals.table(tickers, self.fields, workers)
+		mask = self.mask(table, len(tickers))
+		return tuple(ticker for ticker, passed in zip(tickers, mask) if passed)
+
+
 class Filter():
 	"""Filter class
 	
 	This class implements a filter based on various ticker attributes.
+
+	Attributes:
+		ticker: ticker symbol
+		fundamentals: FundamentalsCache used to look up ticker attributes
 	"""
-	def __init__(self, ticker):
-		self.ticker = yf.Ticker(ticker)
+	def __init__(self, ticker, fundamentals=None):
+		self.ticker = ticker
+		self.fundamentals = fundamentals if fundamentals is not None else default_cache()
 
 	def eq(self, s, val):
 		return s == val
@@ -45,7 +174,7 @@ class Filter():
 	def dividend(self, wanted_div):
 		"""Dividend check"""
 		try:
-			div = self.ticker.info["dividendRate"]
+			div = self.fundamentals.get(self.ticker, "dividendRate")
 		except:
 			div = None
 		print(div)
@@ -62,7 +191,7 @@ class Filter():
 
 	def volume(self, j_fil):
 		"""Volume check loop"""
-		vol = self.ticker.info["volume"]
+		vol = self.fundamentals.get(self.ticker, "volume")
 		logger.info(f"Volume: {vol}")
 		ret = self.primitiveFilter(vol, j_fil)
 		if ret:
@@ -73,7 +202,7 @@ class Filter():
 
 	def marketcap(self, j_fil):
 		"""Volume check loop"""
-		mcap = self.ticker.info["marketCap"]
+		mcap = self.fundamentals.get(self.ticker, "marketCap")
 		logger.info(f"Market cap: {mcap}")
 		ret = self.primitiveFilter(mcap, j_fil)
 		if ret:
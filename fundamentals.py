@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import config
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from instrumentation import default_instrumentation
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Cached in place of fields the provider does not return, e.g. dividendRate of non-paying stocks
+MISSING = "__missing__"
+
+def yahoo_info(ticker) -> dict:
+	"""Fetch full fundamentals for a ticker from yahoo finance"""
+	import yfinance as yf
+	return yf.Ticker(ticker).info
+
+class FundamentalsCache:
+	"""Ticker fundamentals cache
+
+	Caches ticker .info fields with a per-field time to live and evicts
+	least recently used tickers. Fields the provider does not return are
+	cached as MISSING with the same time to live, so they are not fetched
+	again on every lookup. Can be persisted to a JSON file between runs.
+
+	Attributes:
+		fetch: function returning fundamentals dict for a ticker
+		ttl: field -> seconds to live
+		default_ttl: seconds to live for fields not in ttl
+		max_size: max number of cached tickers
+		path: JSON file used for persistence or None
+		hits: number of cache hits
+		misses: number of cache misses
+	"""
+	def __init__(self, fetch=yahoo_info, ttl:dict=None, default_ttl:float=86400, max_size:int=10000, path=None):
+		self.fetch = fetch
+		self.ttl = ttl or {}
+		self.default_ttl = default_ttl
+		self.max_size = max_size
+		self.path = path
+		self.hits = 0
+		self.misses = 0
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+		if self.path:
+			self.load()
+
+	def isFresh(self, field, fetched_at, now) -> bool:
+		"""Check if a field fetched at a given time is still valid"""
+		return now - fetched_at < self.ttl.get(field, self.default_ttl)
+
+	def get(self, ticker, field):
+		"""Return a fundamentals field, fetching ticker info on miss
+
+		Raises KeyError if the provider has no such field for the ticker.
+		"""
+		now = time.time()
+		with self.lock:
+			entry = self.entries.get(ticker)
+			if entry is not None and field in entry and self.isFresh(field, entry[field][1], now):
+				self.hits += 1
+				self.entries.move_to_end(ticker)
+				if entry[field][0] == MISSING:
+					raise KeyError(field)
+				return entry[field][0]
+			self.misses += 1
+
+		logger.info(f"fetching fundamentals for {ticker}")
+		with default_instrumentation().stage("fundamentals_fetch"):
+			info = self.fetch(ticker)
+		with self.lock:
+			entry = self.entries.setdefault(ticker, {})
+			for key, value in info.items():
+				entry[key] = (value, now)
+			if field not in info:
+				entry[field] = (MISSING, now)
+			self.entries.move_to_end(ticker)
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last=False)
+		return info[field]
+
+	def table(self, tickers, fields, workers:int=1) -> dict:
+		"""Return field -> float array over tickers, NaN where missing or not numeric
+
+		Tickers not cached yet are fetched by up to workers threads.
+		"""
+		def row(ticker):
+			values = []
+			for field in fields:
+				try:
+					value = float(self.get(ticker, field))
+				except Exception:
+					value = np.nan
+				values.append(value)
+			return values
+
+		with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+			rows = list(pool.map(row, tickers))
+		columns = np.array(rows, dtype=float).reshape(len(tickers), len(fields))
+		return {field: columns[:, i] for i, field in enumerate(fields)}
+
+	def stats(self) -> dict:
+		"""Return hit/miss counters"""
+		return {"hits":self.hits, "misses":self.misses, "size":len(self.entries)}
+
+	def load(self):
+		"""Load persisted entries, ignoring a missing or corrupt file"""
+		try:
+			with open(self.path, "r") as f:
+				stored = json.load(f)
+		except (OSError, ValueError):
+			logger.info(f"No fundamentals cache loaded from {self.path}")
+			return
+		for ticker, fields in stored.items():
+			self.entries[ticker] = {key: tuple(value) for key, value in fields.items()}
+		logger.info(f"Loaded fundamentals for {len(self.entries)} tickers")
+
+	def save(self):
+		"""Atomically persist entries to path"""
+		if not self.path:
+			return
+		directory = os.path.dirname(self.path) or "."
+		os.makedirs(directory, exist_ok=True)
+		with self.lock:
+			stored = {ticker: dict(fields) for ticker, fields in self.entries.items()}
+		fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+		with os.fdopen(fd, "w") as f:
+			json.dump(stored, f, default=str)
+		os.replace(tmp_path, self.path)
+		logger.info(f"Saved fundamentals for {len(stored)} tickers")
+
+
+_default_cache = None
+
+def default_cache() -> FundamentalsCache:
+	"""Return the process wide fundamentals cache configured from config"""
+	global _default_cache
+	if _default_cache is None:
+		_default_cache = FundamentalsCache(
+			ttl=config.FUNDAMENTALS_TTL,
+			default_ttl=config.FUNDAMENTALS_DEFAULT_TTL,
+			max_size=config.FUNDAMENTALS_CACHE_SIZE,
+			path=config.FUNDAMENTALS_CACHE_FILE
+		)
+	return _default_cache
+
+def set_default_cache(cache:FundamentalsCache):
+	"""Replace the process wide fundamentals cache, e.g. with a local snapshot"""
+	global _default_cache
+	_default_cache = cache
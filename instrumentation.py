@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import logging
+import tempfile
+import threading
+import contextlib
+from utils import chmod_umask
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+_NULL_STAGE = contextlib.nullcontext()
+
+class StageTimer:
+	"""Context manager adding wall and CPU time of a block to a stage"""
+	__slots__ = ("instrumentation", "name", "wall", "cpu")
+
+	def __init__(self, instrumentation, name):
+		self.instrumentation = instrumentation
+		self.name = name
+
+	def __enter__(self):
+		self.wall = time.perf_counter()
+		self.cpu = time.process_time()
+		return self
+
+	def __exit__(self, *exc):
+		self.instrumentation.addStage(
+			self.name,
+			time.perf_counter() - self.wall,
+			time.process_time() - self.cpu
+		)
+		return False
+
+
+class Instrumentation:
+	"""Scan pipeline instrumentation
+
+	Collects per-stage wall and CPU timers and named counters. When
+	disabled, stage() returns a shared no-op context manager and count()
+	returns immediately.
+
+	Attributes:
+		enabled: collect measurements
+		stages: stage -> [wall seconds, cpu seconds, calls]
+		counters: counter -> value
+	"""
+	def __init__(self, enabled=False):
+		self.enabled = enabled
+		self.stages = {}
+		self.counters = {}
+		self.lock = threading.Lock()
+
+	def stage(self, name):
+		"""Return context manager timing a block as a stage"""
+		if not self.enabled:
+			return _NULL_STAGE
+		return StageTimer(self, name)
+
+	def addStage(self, name, wall:float, cpu:float, calls:int=1):
+		"""Add measured time to a stage"""
+		with self.lock:
+			totals = self.stages.setdefault(name, [0.0, 0.0, 0])
+			totals[0] += wall
+			totals[1] += cpu
+			totals[2] += calls
+
+	def count(self, name, value=1):
+		"""Increase a counter"""
+		if not self.enabled:
+			return
+		with self.lock:
+			self.counters[name] = self.counters.get(name, 0) + value
+
+	def reset(self):
+		"""Drop all measurements"""
+		with self.lock:
+			self.stages = {}
+			self.counters = {}
+
+	def snapshot(self) -> dict:
+		"""Return measurements as a JSON serializable dict"""
+		with self.lock:
+			return {
+				"stages":{
+					name: {"wall_seconds":wall, "cpu_seconds":cpu, "calls":calls}
+					for name, (wall, cpu, calls) in self.stages.items()
+				},
+				"counters":dict(self.counters)
+			}
+
+	def merge(self, snapshot:dict):
+		"""Add measurements of another snapshot, e.g. from a worker process"""
+		if not self.enabled:
+			return
+		for name, stage in snapshot["stages"].items():
+			self.addStage(name, stage["wall_seconds"], stage["cpu_seconds"], stage["calls"])
+		for name, value in snapshot["counters"].items():
+			self.count(name, value)
+
+	def writeJson(self, path):
+		"""Write JSON summary"""
+		atomic_write(path, json.dumps(self.snapshot(), indent=1, sort_keys=True))
+		logger.info(f"Metrics summary written to {path}")
+
+	def writePrometheus(self, path, prefix="stockhunter"):
+		"""Write summary in Prometheus text exposition format"""
+		snapshot = self.snapshot()
+		lines = []
+		for metric, key, help_text in (
+			("stage_wall_seconds", "wall_seconds", "Wall time spent in a stage"),
+			("stage_cpu_seconds", "cpu_seconds", "CPU time spent in a stage"),
+			("stage_calls", "calls", "Times a stage was entered")
+		):
+			lines.append(f"# HELP {prefix}_{metric}_total {help_text}")
+			lines.append(f"# TYPE {prefix}_{metric}_total counter")
+			for name, stage in sorted(snapshot["stages"].items()):
+				lines.append(f'{prefix}_{metric}_total{{stage="{name}"}} {stage[key]}')
+		for name, value in sorted(snapshot["counters"].items()):
+			lines.append(f"# TYPE {prefix}_{name}_total counter")
+			lines.append(f"{prefix}_{name}_total {value}")
+		atomic_write(path, "\n".join(lines) + "\n")
+		logger.info(f"Prometheus metrics written to {path}")
+
+	@contextlib.contextmanager
+	def profile(self, path):
+		"""Profile a block with cProfile and dump stats to path"""
+		profiler = cProfile.Profile()
+		profiler.enable()
+		try:
+			yield profiler
+		finally:
+			profiler.disable()
+			profiler.dump_stats(path)
+			pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+			logger.info(f"Profile written to {path}")
+
+
+def atomic_write(path, text:str):
+	"""Write text to a temporary file and rename it over path"""
+	directory = os.path.dirname(path) or "."
+	fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+	with os.fdopen(fd, "w") as f:
+		f.write(text)
+	chmod_umask(tmp_path)
+	os.replace(tmp_path, path)
+
+
+_default_instrumentation = Instrumentation()
+
+def default_instrumentation() -> Instrumentation:
+	"""Return the process wide instrumentation, disabled until enabled"""
+	return _default_instrumentation
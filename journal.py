@@ -0,0 +1,75 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class Journal:
+	"""Append-only scan checkpoint journal
+
+	JSON Lines file starting with the scan parameters, then one record per
+	finished ticker stage: {"ticker":..., "stage":..., "value":...}. Records
+	are flushed to the OS on every write and synced to disk every sync_every
+	records, so a crashed scan loses at most its last unflushed line. A
+	truncated last line is dropped on load.
+
+	Attributes:
+		path: journal file
+		params: scan parameters, a resumed journal must match them
+		stages: stage -> {ticker: value} of recorded results
+		sync_every: records between fsync calls
+	"""
+	def __init__(self, path, params:dict, resume=False, sync_every:int=50):
+		self.path = path
+		self.params = params
+		self.sync_every = sync_every
+		self.stages = {}
+		self.unsynced = 0
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		if resume and os.path.exists(self.path):
+			self.load()
+			self.file = open(self.path, "a")
+		else:
+			self.file = open(self.path, "w")
+			self.append({"params":self.params})
+
+	def load(self):
+		"""Read recorded stages, checking scan parameters"""
+		with open(self.path, "rb") as f:
+			content = f.read()
+		# Drop a last line truncated by a crash mid-write, appends start on a fresh line
+		complete = content.rfind(b"\n") + 1
+		if complete < len(content):
+			os.truncate(self.path, complete)
+		records = [json.loads(line) for line in content[:complete].decode().splitlines() if line]
+		if not records or records[0].get("params") != self.params:
+			logger.error(f"Journal {self.path} was written with different parameters")
+			raise ValueError(f"Journal {self.path} was written with different parameters")
+		for record in records[1:]:
+			self.stages.setdefault(record["stage"], {})[record["ticker"]] = record["value"]
+		logger.info(f"Resuming from {self.path}, {len(records) - 1} records")
+
+	def append(self, record:dict):
+		self.file.write(json.dumps(record, default=str) + "\n")
+		self.file.flush()
+		self.unsynced += 1
+		if self.unsynced >= self.sync_every:
+			os.fsync(self.file.fileno())
+			self.unsynced = 0
+
+	def record(self, ticker, stage, value):
+		"""Append a finished ticker stage"""
+		self.stages.setdefault(stage, {})[ticker] = value
+		self.append({"ticker":ticker, "stage":stage, "value":value})
+
+	def get(self, stage) -> dict:
+		"""Return {ticker: value} recorded for a stage, kept up to date by record"""
+		return self.stages.setdefault(stage, {})
+
+	def close(self):
+		self.file.flush()
+		os.fsync(self.file.fileno())
+		self.file.close()
@@ -0,0 +1,72 @@
+import logging
+import numpy as np
+from collections import namedtuple
+from analyzer import RisingEdgeAnalyzer, get_columns
+from risk_calculator import RERiskCalculator, PriceEntryRiskCalculator
+from resultcache import ResultCache, candle_digest
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+TickerResult = namedtuple("TickerResult", ("ticker", "risk", "entry_risk", "avg_price", "avg_vol", "candles"))
+TickerResult.__doc__ = """Analysis result of a single ticker, entry_risk is None without winning entry points"""
+
+def analyze_fused(ticker, data, wanted_gain:int, period_days:int, current_price:float=None, cache:ResultCache=None) -> TickerResult:
+	"""Rising edges, averages, price/average ratios and both risks in one pass
+
+	Columns are read once and shared by all stages, producing the same
+	numbers as running the re, avg and rpa analyzers and both risk
+	calculators separately. The price independent part is looked up in
+	and stored to cache, only the entry risk is recalculated on a hit.
+	"""
+	if cache is None:
+		summary = fused_summary(ticker, data, wanted_gain, period_days)
+	else:
+		params = {"wanted_gain":wanted_gain, "period_days":period_days}
+		digest = candle_digest(data)
+		summary = cache.get("fused", params, digest)
+		if summary is None:
+			summary = fused_summary(ticker, data, wanted_gain, period_days)
+			cache.put("fused", params, digest, summary)
+
+	if current_price is None:
+		from collector import YahooCollector
+		current_price = YahooCollector.getPrice(ticker)
+	if np.isnan(summary["win_ratio"]):
+		entry_risk = None
+	else:
+		entry_risk = PriceEntryRiskCalculator.entryRiskFromRatio(current_price, summary["avg_price"], summary["win_ratio"])
+	return TickerResult(ticker, summary["risk"], entry_risk, summary["avg_price"], summary["avg_vol"], summary["candles"])
+
+def fused_summary(ticker, data, wanted_gain:int, period_days:int) -> dict:
+	"""Return price independent fused analysis results
+
+	win_ratio is the average price/average ratio of winning entry points,
+	NaN without winning entry points.
+	"""
+	open_p, high, low, close_p, volume = get_columns(data, "Open", "High", "Low", "Close", "Volume")
+	n = len(open_p)
+	if n == 0:
+		logger.error(f"No data to analyze for {ticker}")
+		raise ValueError(f"No data to analyze for {ticker}")
+
+	# Rising edges
+	rising_edge = RisingEdgeAnalyzer(data, wanted_gain, period_days)
+	gains = rising_edge.getPercent(close_p / open_p)
+	intraday = rising_edge.countIntradayGains(rising_edge.getPercent(np.maximum(high / open_p, close_p / low)))
+	rising_edges = rising_edge.countGains(gains) + intraday
+	del gains, intraday
+
+	# Expanding averages and price/average ratios
+	ctr = np.arange(1, n + 1)
+	rolling_avg_price = np.cumsum((high + low) / 2) / ctr
+	avg_price = float(rolling_avg_price[-1])
+	avg_vol = float(np.cumsum(volume)[-1] / n)
+	price_avg_ratios = np.divide(open_p, rolling_avg_price, out=rolling_avg_price)
+
+	risk = RERiskCalculator.failedPercent(rising_edges)
+	try:
+		win_ratio = float(PriceEntryRiskCalculator.averageWinRatio(rising_edges, price_avg_ratios))
+	except ValueError:
+		win_ratio = np.nan
+	return {"risk":risk, "avg_price":avg_price, "avg_vol":avg_vol, "candles":n, "win_ratio":win_ratio}
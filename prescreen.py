@@ -0,0 +1,65 @@
+import logging
+import datetime
+import numpy as np
+from analyzer import RisingEdgeAnalyzer
+from candlestore import CandleStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+def risk_bound(data, covered_start:datetime.date, covered_end:datetime.date,
+		start_date:datetime.date, end_date:datetime.date, wanted_gain, period_days:int) -> float:
+	"""Return a lower bound on rising edge risk over [start_date, end_date) from cached candles
+
+	Cached candles cover [covered_start, covered_end) without gaps. An entry
+	point's edges only depend on the period_days candles from it on, so
+	entry points whose whole period is cached are counted exactly. The last
+	cached candle may have been incomplete and is refetched by the
+	collector, so periods reaching it do not count as cached. Every
+	other entry point is assumed to win, and every uncached day is assumed
+	to hold one. Fewer failures over more entry points can only lower the
+	risk, so the full analysis never scores below the bound.
+	"""
+	first = max(start_date, covered_start)
+	last = min(end_date, covered_end)
+	uncached_days = (end_date - start_date).days
+	if first >= last:
+		return 0.0
+	uncached_days -= (last - first).days
+
+	dates = np.asarray(data.index).astype("datetime64[D]")
+	lo, hi = np.searchsorted(dates, [np.datetime64(first, "D"), np.datetime64(last, "D")])
+	segment = data.iloc[lo:hi]
+	n = len(segment)
+	total = n + uncached_days
+	if n == 0 or total <= 0:
+		return 0.0
+
+	an = RisingEdgeAnalyzer(segment, wanted_gain, period_days)
+	edges = an.countGains(an.getGains()) + an.countIntradayGains(an.getIntradayGains())
+	known = n - max(period_days, 1)
+	failed = int(np.count_nonzero(edges[:max(known, 0)] == 0))
+	return (failed / total) * 100
+
+
+def prescreen(tickers, store:CandleStore, start_date:datetime.date, end_date:datetime.date,
+		wanted_gain, period_days:int, risk_appetite:float) -> tuple:
+	"""Return (survivors, bounds) keeping tickers whose risk bound is within risk_appetite
+
+	Only the local candle store is read, tickers without cached candles
+	always survive. bounds maps every bounded ticker to its bound.
+	"""
+	survivors, bounds = [], {}
+	for ticker in tickers:
+		cached = store.load(ticker)
+		if cached is None:
+			survivors.append(ticker)
+			continue
+		data, covered_start, covered_end = cached
+		bound = risk_bound(data, covered_start, covered_end, start_date, end_date, wanted_gain, period_days)
+		bounds[ticker] = bound
+		if bound > risk_appetite:
+			logger.info(f"{ticker}: risk bound {round(bound, 2)}% above appetite, dropped")
+			continue
+		survivors.append(ticker)
+	return tuple(survivors), bounds
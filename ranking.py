@@ -0,0 +1,106 @@
+import math
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+RANK_FIELDS = ("risk", "entry_risk", "avg_price", "avg_vol", "candles")
+
+def parse_weights(text) -> dict:
+	"""Parse "risk=1,entry_risk=0.5" into {field: weight}"""
+	weights = {}
+	for item in text.split(","):
+		field, _, weight = item.partition("=")
+		field = field.strip()
+		if field not in RANK_FIELDS:
+			logger.error(f"Unknown ranking field {field}")
+			raise ValueError(f"Unknown ranking field {field}, expected one of {RANK_FIELDS}")
+		try:
+			weights[field] = float(weight)
+		except ValueError:
+			logger.error(f"Wrong weight of ranking field {field}")
+			raise ValueError(f"Wrong weight of ranking field {field}: {weight!r}")
+	return weights
+
+
+class Scorer:
+	"""Composite score of a result row, lower is better
+
+	score = sum(weight * row[field]) over weighted fields. A missing or
+	NaN value, e.g. entry_risk of a ticker without winning entry points,
+	counts as missing_value.
+
+	Attributes:
+		weights: field -> weight
+		missing_value: value used for missing fields
+	"""
+	def __init__(self, weights:dict, missing_value:float=100):
+		for field in weights:
+			if field not in RANK_FIELDS:
+				logger.error(f"Unknown ranking field {field}")
+				raise ValueError(f"Unknown ranking field {field}, expected one of {RANK_FIELDS}")
+		self.weights = dict(weights)
+		self.missing_value = missing_value
+
+	def score(self, row:dict) -> float:
+		total = 0.0
+		for field, weight in self.weights.items():
+			value = row.get(field)
+			if value is None or math.isnan(float(value)):
+				value = self.missing_value
+			total += weight * float(value)
+		return total
+
+
+class RankEntry:
+	"""Heap entry ordered worst first, so the heap root is the entry to evict"""
+	__slots__ = ("key", "row")
+
+	def __init__(self, score:float, row:dict):
+		self.key = (score, str(row["ticker"]))
+		self.row = row
+
+	def __lt__(self, other):
+		return self.key > other.key
+
+
+class TopK:
+	"""Streaming top-k ranker over a bounded heap
+
+	Rows are pushed as tickers finish, in any order. At most k rows are
+	held, a new row replaces the worst one when it scores better. Ties are
+	broken by ticker, so parallel, sharded and resumed scans rank the same
+	rows identically.
+
+	Attributes:
+		k: number of rows kept
+		scorer: Scorer of pushed rows
+		heap: kept RankEntry objects, worst at the root
+		seen: number of rows pushed
+	"""
+	def __init__(self, k:int, scorer:Scorer):
+		if k <= 0:
+			logger.error("Ranking size must be positive")
+			raise ValueError("Ranking size must be positive")
+		self.k = k
+		self.scorer = scorer
+		self.heap = []
+		self.seen = 0
+
+	def push(self, row:dict):
+		"""Offer a result row to the ranking"""
+		self.seen += 1
+		entry = RankEntry(self.scorer.score(row), row)
+		if len(self.heap) < self.k:
+			heapq.heappush(self.heap, entry)
+		elif self.heap[0] < entry:
+			heapq.heapreplace(self.heap, entry)
+
+	def ranking(self) -> list:
+		"""Return kept rows best first with rank and score columns prepended"""
+		entries = sorted(self.heap, key=lambda entry: entry.key)
+		return [
+			{"rank":rank, "score":round(entry.key[0], 4), **entry.row}
+			for rank, entry in enumerate(entries, start=1)
+		]
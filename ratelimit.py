@@ -0,0 +1,55 @@
+import time
+import random
+import asyncio
+import logging
+from instrumentation import default_instrumentation
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class TokenBucket:
+	"""Asyncio token bucket rate limiter
+
+	Attributes:
+		rate: tokens added per second, 0 or less disables limiting
+		capacity: max tokens, i.e. allowed burst size
+		tokens: currently available tokens
+	"""
+	def __init__(self, rate:float, capacity:float=None):
+		self.rate = rate
+		self.capacity = capacity if capacity is not None else max(1, rate)
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+		self.lock = asyncio.Lock()
+
+	def refill(self):
+		"""Add tokens accumulated since last update"""
+		now = time.monotonic()
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	async def acquire(self):
+		"""Wait until a token is available and take it"""
+		if self.rate <= 0:
+			return
+		async with self.lock:
+			self.refill()
+			while self.tokens < 1:
+				await asyncio.sleep((1 - self.tokens) / self.rate)
+				self.refill()
+			self.tokens -= 1
+
+async def retry(call, retries:int, base_delay:float, max_delay:float):
+	"""Await call(), retrying failures with exponential backoff and full jitter"""
+	attempt = 0
+	while True:
+		try:
+			return await call()
+		except Exception as e:
+			if attempt >= retries:
+				raise
+			delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+			attempt += 1
+			default_instrumentation().count("retries")
+			logger.info(f"Attempt {attempt} failed with {e}, retrying in {round(delay, 2)}s")
+			await asyncio.sleep(delay)
@@ -0,0 +1,156 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import config
+import numpy as np
+from analyzer import get_columns
+from candlestore import FIELDS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+def candle_digest(data) -> bytes:
+	"""Return a hash of the OHLCV values of candle data
+
+	Analysis results only depend on candle values, so identical candles
+	hash the same whatever their source, index or column layout.
+	"""
+	fields = [field for field in FIELDS if field in data]
+	h = hashlib.blake2b(digest_size=16)
+	h.update(",".join(fields).encode())
+	for column in get_columns(data, *fields):
+		h.update(column.tobytes())
+	return h.digest()
+
+class ResultCache:
+	"""Content-addressed on-disk analysis result cache
+
+	Results are stored under a hash of the analysis kind, its parameters
+	and the candle values, so changed candles never hit a stale entry.
+	Each entry is an uncompressed .npz file of named arrays and scalars.
+	File modification time tracks recency: hits touch their entry, and once
+	the cache grows over max_bytes the least recently used entries are
+	removed until it is back under low_water of it. Several processes may
+	share a cache directory, the tracked size is then approximate until
+	the next eviction rescans it.
+
+	Attributes:
+		path: cache directory
+		max_bytes: size above which entries are evicted
+		low_water: fraction of max_bytes eviction stops at
+		size: tracked size of cached entries in bytes
+		hits: number of cache hits
+		misses: number of cache misses
+	"""
+	def __init__(self, path, max_bytes:int, low_water:float=0.9):
+		self.path = path
+		self.max_bytes = max_bytes
+		self.low_water = low_water
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(self.path, exist_ok=True)
+		self.size = sum(size for _, _, size in self.entries())
+
+	def key(self, kind, params:dict, digest:bytes) -> str:
+		"""Return entry key of an analysis kind with parameters on candles with digest"""
+		h = hashlib.blake2b(digest_size=20)
+		h.update(kind.encode())
+		for name, value in sorted(params.items()):
+			h.update(name.encode())
+			if isinstance(value, np.ndarray):
+				h.update(np.ascontiguousarray(value, dtype=float).tobytes())
+			else:
+				h.update(json.dumps(value, default=str).encode())
+		h.update(digest)
+		return h.hexdigest()
+
+	def entryPath(self, key) -> str:
+		"""Return file path of an entry, sharded by key prefix"""
+		return os.path.join(self.path, key[:2], key + ".npz")
+
+	def get(self, kind, params:dict, digest:bytes) -> dict:
+		"""Return cached result as name -> value or None on miss
+
+		0-d arrays are returned as Python scalars.
+		"""
+		path = self.entryPath(self.key(kind, params, digest))
+		try:
+			with np.load(path) as stored:
+				result = {name: stored[name] for name in stored.files}
+			os.utime(path)
+		except (OSError, ValueError):
+			self.misses += 1
+			return None
+		self.hits += 1
+		logger.info(f"{kind} result cache hit")
+		return {name: value.item() if value.ndim == 0 else value for name, value in result.items()}
+
+	def put(self, kind, params:dict, digest:bytes, result:dict):
+		"""Atomically store a result of named arrays and scalars, evicting if over size"""
+		path = self.entryPath(self.key(kind, params, digest))
+		directory = os.path.dirname(path)
+		os.makedirs(directory, exist_ok=True)
+		fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "wb") as f:
+				np.savez(f, **{name: np.asarray(value) for name, value in result.items()})
+			try:
+				replaced = os.path.getsize(path)
+			except OSError:
+				replaced = 0
+			os.replace(tmp_path, path)
+		except:
+			os.remove(tmp_path)
+			raise
+		self.size += os.path.getsize(path) - replaced
+		if self.size > self.max_bytes:
+			self.evict()
+
+	def entries(self) -> list:
+		"""Return (mtime, path, size) of every cached entry"""
+		entries = []
+		for shard in os.scandir(self.path):
+			if not shard.is_dir():
+				continue
+			for entry in os.scandir(shard.path):
+				if not entry.name.endswith(".npz"):
+					continue
+				try:
+					stat = entry.stat()
+				except FileNotFoundError:
+					continue
+				entries.append((stat.st_mtime, entry.path, stat.st_size))
+		return entries
+
+	def evict(self):
+		"""Remove least recently used entries until size is under low_water of max_bytes"""
+		entries = sorted(self.entries())
+		self.size = sum(size for _, _, size in entries)
+		evicted = 0
+		for _, path, size in entries:
+			if self.size <= self.max_bytes * self.low_water:
+				break
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				# Evicted by another process meanwhile
+				pass
+			self.size -= size
+			evicted += 1
+		logger.info(f"Evicted {evicted} cached results, {self.size} bytes left")
+
+	def stats(self) -> dict:
+		"""Return hit/miss counters and tracked size"""
+		return {"hits":self.hits, "misses":self.misses, "bytes":self.size}
+
+
+_default_cache = None
+
+def default_result_cache() -> ResultCache:
+	"""Return the process wide result cache configured from config"""
+	global _default_cache
+	if _default_cache is None:
+		_default_cache = ResultCache(config.RESULT_CACHE_DIR, config.RESULT_CACHE_SIZE)
+	return _default_cache
@@ -1,6 +1,7 @@
 import logging
+import numpy as np
 from abc import ABC, abstractmethod
-from collector import YahooCollector
+from instrumentation import default_instrumentation
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -50,7 +51,7 @@ class BaseRiskCalculator(ABC):
 
 	def getRisk(self):
 		"""Return calculated risk"""
-		if not self.risk:
+		if self.risk is None:
 			logger.error("No risk calculated")
 			raise ValueError("No risk calculated")
 		return self.risk
@@ -65,7 +66,7 @@ class RERiskCalculator(BaseRiskCalculator):
 
 	Calculates risk based on data given by rising edge analyzer.
 	Attributes:
-		analysis_data: tuple of entry points
+		analysis_data: array of entry points
 	"""
 	def __init__(self, analysis_data):
 		super().__init__(analysis_data)
@@ -73,13 +74,18 @@ class RERiskCalculator(BaseRiskCalculator):
 
 	def calculateRisk(self):
 		"""Calculate risk by finding fails frequency"""
-		failed = sum(x == 0 for x in self.analysis_data)
-		self.risk = (failed / len(self.analysis_data)) * 100
+		self.risk = RERiskCalculator.failedPercent(self.analysis_data)
+
+	@staticmethod
+	def failedPercent(rising_edge_data) -> float:
+		"""Return % of entry points without rising edges"""
+		failed = np.count_nonzero(np.asarray(rising_edge_data) == 0)
+		return (failed / len(rising_edge_data)) * 100
 
 	def verifyData(self):
-		"""Check if provided data is in tuple"""
+		"""Check if provided data is in array or tuple"""
 		datatype = type(self.analysis_data)
-		if datatype is not tuple:
+		if datatype is not np.ndarray and datatype is not tuple:
 			logger.error(f"Wrong analysis data type {datatype}")
 			raise ValueError(f"Wrong analysis data type {datatype}")
 		else:
@@ -96,7 +102,8 @@ class PriceEntryRiskCalculator(BaseRiskCalculator):
 				"ticker":ticker,
 				"avg_price":averages["avg_price"],
 				"rising_edge_data":rising_edge_results,
-				"price_avg_ratios":price_avg_ratios
+				"price_avg_ratios":price_avg_ratios,
+				"current_price":current price, optional, looked up if missing
 			}
 	"""
 	def __init__(self, analysis_data:dict):
@@ -107,35 +114,57 @@ class PriceEntryRiskCalculator(BaseRiskCalculator):
 		"""Calculate price entry risk"""
 		
 		# Get current price
-		current_price = YahooCollector.getPrice(self.analysis_data["ticker"])
+		current_price = self.analysis_data.get("current_price")
+		if current_price is None:
+			from collector import YahooCollector
+			with default_instrumentation().stage("price_lookup"):
+				current_price = YahooCollector.getPrice(self.analysis_data["ticker"])
 
 		# Get average price as last rolling average price
 		average_price = self.analysis_data["avg_price"]
 
+		self.risk = PriceEntryRiskCalculator.entryRisk(
+			current_price,
+			average_price,
+			self.analysis_data["rising_edge_data"],
+			self.analysis_data["price_avg_ratios"]
+		)
+
+	@staticmethod
+	def entryRisk(current_price, average_price, rising_edge_data, price_avg_ratios) -> float:
+		"""Return price entry risk of current price against winning entry points"""
+		average_win_ratio = PriceEntryRiskCalculator.averageWinRatio(rising_edge_data, price_avg_ratios)
+		return PriceEntryRiskCalculator.entryRiskFromRatio(current_price, average_price, average_win_ratio)
+
+	@staticmethod
+	def averageWinRatio(rising_edge_data, price_avg_ratios) -> float:
+		"""Return price/average ratio of winning entry points weighted by their rising edges"""
+		rising_edge_data = np.asarray(rising_edge_data)
+		price_avg_ratios = np.asarray(price_avg_ratios, dtype=float)
+
+		wins = rising_edge_data > 0
+		counter = rising_edge_data[wins].sum()
+		total_ratios = np.dot(price_avg_ratios[wins], rising_edge_data[wins])
+		if counter == 0:
+			logger.error("No winning entry points")
+			raise ValueError("No winning entry points")
+		return total_ratios / counter
+
+	@staticmethod
+	def entryRiskFromRatio(current_price, average_price, average_win_ratio) -> float:
+		"""Return price entry risk of current price against the average win ratio"""
 		current_price_ratio = current_price / average_price
 		#print("Current price/avg ratio:", current_price_ratio, average_price)
-
-		rising_edge_data = self.analysis_data["rising_edge_data"]
-		price_avg_ratios = self.analysis_data["price_avg_ratios"]
-
-		total_ratios = 0
-		counter = 0
-		for i in range(len(rising_edge_data)):
-			if rising_edge_data[i] > 0:
-				counter += rising_edge_data[i]
-				total_ratios += price_avg_ratios[i]*rising_edge_data[i]
-
-		average_win_ratio = total_ratios / counter
 		#print("Average win ratio:", average_win_ratio)
 
 		# Where we stand
 		#similarity = current_price_ratio / average_win_ratio
 		if current_price_ratio >= 1:
-			self.risk = 100
+			return 100
 		elif current_price_ratio < average_win_ratio:
-			self.risk = 0
+			return 0
 		else:
-			self.risk = (current_price_ratio - average_win_ratio)/(1 - average_win_ratio)*100 
+			return (current_price_ratio - average_win_ratio)/(1 - average_win_ratio)*100
 
 
 	def verifyData(self):
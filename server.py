@@ -0,0 +1,210 @@
+import json
+import time
+import logging
+import datetime
+import threading
+import config
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from analyzer import get_columns
+from candlestore import FIELDS
+from daterange import DateRange
+from filter import CompiledFilter
+from universestore import CandleView
+from pipeline import analyze_fused
+from instrumentation import default_instrumentation
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+metrics = default_instrumentation()
+
+def to_view(data) -> CandleView:
+	"""Return candles as contiguous columns with a day-resolution date index"""
+	index = np.asarray(data.index).astype("datetime64[D]")
+	return CandleView(index, dict(zip(FIELDS, get_columns(data, *FIELDS))))
+
+
+class Screener:
+	"""In-memory screening state
+
+	Holds candles of every ticker for the whole history, queries slice
+	their sampling window out of them without copying. A refresh loads a
+	new snapshot and swaps it in, so queries running meanwhile keep
+	reading the old one.
+
+	Attributes:
+		tickers: screened tickers
+		build_collector: function (start_date, end_date) returning a Collector
+		history_days: days of candles kept in memory
+		col: collector of the last refresh, used for price lookups
+		start_date: first date of the history held in memory
+		candles: ticker -> CandleView
+		errors: ticker -> error of the last refresh
+		refreshed: time of the last refresh
+		lookup_filter: CompiledFilter of config.LOOKUP_FILTER
+		result_cache: ResultCache shared by queries on the same candles or None
+	"""
+	def __init__(self, tickers, build_collector, history_days:int, result_cache=None):
+		self.tickers = tuple(tickers)
+		self.build_collector = build_collector
+		self.history_days = history_days
+		self.col = None
+		self.start_date = None
+		self.candles = {}
+		self.errors = {}
+		self.refreshed = None
+		self.lookup_filter = CompiledFilter(config.LOOKUP_FILTER)
+		self.result_cache = result_cache
+		self.refresh_lock = threading.Lock()
+
+	def refresh(self):
+		"""Load candles for the whole history and swap them in"""
+		with self.refresh_lock:
+			end_date = DateRange.getCurrentDate()
+			start_date = end_date - datetime.timedelta(days=self.history_days)
+			col = self.build_collector(start_date, end_date)
+			candles, errors = {}, {}
+			with metrics.stage("server_refresh"):
+				for ticker, data, error in col.getDataBatch(self.tickers):
+					if error is not None:
+						errors[ticker] = str(error)
+						continue
+					candles[ticker] = to_view(data)
+			self.col, self.start_date, self.candles, self.errors = col, start_date, candles, errors
+			self.refreshed = time.time()
+			logger.info(f"Refreshed {len(candles)} tickers, {len(errors)} failed")
+
+	def refreshLoop(self, interval:float, stop:threading.Event):
+		"""Refresh every interval seconds until stop is set"""
+		while not stop.wait(interval):
+			try:
+				self.refresh()
+			except Exception as e:
+				logger.error(f"Refresh failed: {e}")
+
+	def window(self, candles:CandleView, start_date:datetime.date) -> CandleView:
+		"""Return candles from start_date on, as views"""
+		first = int(np.searchsorted(candles.index, np.datetime64(start_date, "D")))
+		return CandleView(candles.index[first:], {field: column[first:] for field, column in candles.items()})
+
+	def query(self, operation, gains:int, period:str, multiple:int, risk_appetite:float, tickers=None) -> dict:
+		"""Answer an analysis or lookup query from the in-memory candles"""
+		if operation not in ("analysis", "lookup"):
+			raise ValueError(f"Unknown operation {operation}")
+		if gains <= 0 or multiple <= 0:
+			raise ValueError("gains and multiple must be positive")
+		col, history_start, candles, errors = self.col, self.start_date, self.candles, self.errors
+		if col is None:
+			raise ValueError("No data loaded yet")
+		start_date, end_date = DateRange(period, multiple).getRange()
+		# Answering from fewer candles than the window would differ from the CLI
+		if start_date < history_start:
+			raise ValueError(f"Sampling window starts {start_date}, before the history held since {history_start}, raise --history")
+		days = DateRange.periodToDays(period)
+
+		results, skipped = [], dict(errors)
+		tickers = tickers or self.tickers
+		if operation == "lookup":
+			with metrics.stage("filter"):
+				tickers = self.lookup_filter.select(tickers, workers=config.IO_WORKERS)
+		for ticker in tickers:
+			if ticker not in candles:
+				skipped.setdefault(ticker, "Not screened")
+				continue
+			try:
+				data = self.window(candles[ticker], start_date)
+				with metrics.stage("price_lookup"):
+					current_price = col.getPrice(ticker)
+				with metrics.stage("analysis"):
+					result = analyze_fused(ticker, data, gains, days, current_price, self.result_cache)
+			except Exception as e:
+				skipped[ticker] = str(e)
+				continue
+			results.append({**result._asdict(), "candidate":bool(result.risk <= risk_appetite)})
+		return {
+			"operation":operation,
+			"gains":gains,
+			"period":period,
+			"period_days":days,
+			"multiple":multiple,
+			"risk_appetite":risk_appetite,
+			"start_date":start_date.isoformat(),
+			"end_date":end_date.isoformat(),
+			"results":results,
+			"candidates":[result["ticker"] for result in results if result["candidate"]],
+			"skipped":skipped
+		}
+
+	def status(self) -> dict:
+		"""Return loaded tickers and refresh time"""
+		return {
+			"tickers":len(self.tickers),
+			"loaded":len(self.candles),
+			"failed":self.errors,
+			"refreshed":self.refreshed
+		}
+
+
+class ScreeningHandler(BaseHTTPRequestHandler):
+	"""JSON over HTTP screening requests
+
+	GET /analysis?gains=5&period=2w&multiple=10&risk=50&tickers=A,B
+	GET /lookup with the same parameters, applying the lookup filter first
+	GET /status
+	POST /refresh
+	"""
+	def do_GET(self):
+		url = urlparse(self.path)
+		params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+		screener = self.server.screener
+		try:
+			if url.path == "/status":
+				return self.reply(200, screener.status())
+			operation = url.path.strip("/")
+			if "gains" not in params or "period" not in params:
+				raise ValueError("gains and period are required")
+			tickers = tuple(params["tickers"].split(",")) if params.get("tickers") else None
+			with metrics.stage("server_query"):
+				body = screener.query(
+					operation, int(params["gains"]), params["period"], int(params.get("multiple", 1)),
+					float(params.get("risk", 50)), tickers
+				)
+			self.reply(200, body)
+		except ValueError as e:
+			self.reply(400, {"error":str(e)})
+
+	def do_POST(self):
+		if urlparse(self.path).path != "/refresh":
+			return self.reply(404, {"error":"Not found"})
+		self.server.screener.refresh()
+		self.reply(200, self.server.screener.status())
+
+	def reply(self, code:int, body:dict):
+		payload = json.dumps(body, default=str).encode()
+		self.send_response(code)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def log_message(self, format, *args):
+		logger.info(f"{self.address_string()} {format % args}")
+
+
+def serve(screener:Screener, host, port:int, refresh_interval:float):
+	"""Load data, then answer queries until interrupted, refreshing in the background"""
+	screener.refresh()
+	httpd = ThreadingHTTPServer((host, port), ScreeningHandler)
+	httpd.daemon_threads = True
+	httpd.screener = screener
+	stop = threading.Event()
+	if refresh_interval > 0:
+		threading.Thread(target=screener.refreshLoop, args=(refresh_interval, stop), daemon=True).start()
+	logger.info(f"Serving on {host}:{port}")
+	try:
+		httpd.serve_forever()
+	finally:
+		stop.set()
+		httpd.server_close()
@@ -0,0 +1,173 @@
+import os
+import csv
+import json
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from utils import chmod_umask
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class ResultsSink:
+	"""Results sink wrapper class
+
+	Writes one row per ticker in batches. Rows go to a temporary file next
+	to the target which is renamed over it on close, so readers never see
+	a partially written file.
+
+	Attributes:
+		stype: sink type, csv, jsonl or parquet
+		sink: sink instance
+	"""
+	def __init__(self, stype, filename, **kwargs):
+		buffer_size = int(kwargs.pop("buffer_size", 500))
+		if stype == "csv":
+			self.sink = CSVSink(filename, buffer_size)
+		elif stype == "jsonl":
+			self.sink = JSONLinesSink(filename, buffer_size)
+		elif stype == "parquet":
+			self.sink = ParquetSink(filename, buffer_size)
+		else:
+			logger.error("Wrong results sink type")
+			raise ValueError("Wrong results sink type")
+
+	@staticmethod
+	def typeFromFilename(filename) -> str:
+		"""Guess sink type from file extension"""
+		extension = os.path.splitext(filename)[1].lower()
+		return {".jsonl":"jsonl", ".parquet":"parquet"}.get(extension, "csv")
+
+	def write(self, row:dict):
+		"""Buffer a result row"""
+		self.sink.add(row)
+
+	def close(self):
+		"""Write remaining rows and publish the file"""
+		self.sink.close()
+
+	def abort(self):
+		"""Discard everything written so far"""
+		self.sink.abort()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, *exc):
+		if exc_type is None:
+			self.close()
+		else:
+			self.abort()
+		return False
+
+
+class BaseSink(ABC):
+	"""Buffered atomic file sink base class
+
+	Attributes:
+		filename: published file
+		buffer_size: rows buffered before a batch is written
+		rows: buffered rows
+		tmp_path: temporary file written until close
+	"""
+	def __init__(self, filename, buffer_size:int):
+		self.filename = filename
+		self.buffer_size = buffer_size
+		self.rows = []
+		self.written = 0
+		directory = os.path.dirname(os.path.abspath(filename))
+		fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+		os.close(fd)
+
+	def add(self, row:dict):
+		"""Buffer a row, writing a batch when the buffer is full"""
+		self.rows.append(row)
+		if len(self.rows) >= self.buffer_size:
+			self.flush()
+
+	def flush(self):
+		"""Write buffered rows to the temporary file"""
+		if not self.rows:
+			return
+		self.writeRows(self.rows)
+		self.written += len(self.rows)
+		self.rows = []
+
+	def close(self):
+		"""Flush, finish the temporary file and rename it over filename"""
+		self.flush()
+		self.finish()
+		chmod_umask(self.tmp_path)
+		os.replace(self.tmp_path, self.filename)
+		logger.info(f"Wrote {self.written} results to {self.filename}")
+
+	def abort(self):
+		"""Remove the temporary file"""
+		self.finish()
+		if os.path.exists(self.tmp_path):
+			os.remove(self.tmp_path)
+
+	@abstractmethod
+	def writeRows(self, rows:list):
+		"""Append rows to the temporary file"""
+		pass
+
+	def finish(self):
+		"""Release open file handles"""
+		pass
+
+
+class CSVSink(BaseSink):
+	"""CSV sink, columns are taken from the first row"""
+	def __init__(self, filename, buffer_size:int):
+		super().__init__(filename, buffer_size)
+		self.file = open(self.tmp_path, "w", newline="")
+		self.writer = None
+
+	def writeRows(self, rows:list):
+		if self.writer is None:
+			self.writer = csv.DictWriter(self.file, fieldnames=list(rows[0]))
+			self.writer.writeheader()
+		self.writer.writerows(rows)
+
+	def finish(self):
+		self.file.close()
+
+
+class JSONLinesSink(BaseSink):
+	"""JSON Lines sink, one JSON object per row"""
+	def __init__(self, filename, buffer_size:int):
+		super().__init__(filename, buffer_size)
+		self.file = open(self.tmp_path, "w")
+
+	def writeRows(self, rows:list):
+		self.file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+
+	def finish(self):
+		self.file.close()
+
+
+class ParquetSink(BaseSink):
+	"""Parquet sink, one row group per batch, requires pyarrow"""
+	def __init__(self, filename, buffer_size:int):
+		try:
+			import pyarrow
+			import pyarrow.parquet
+		except ImportError:
+			logger.error("Parquet results require pyarrow")
+			raise ValueError("Parquet results require pyarrow")
+		super().__init__(filename, buffer_size)
+		self.pa = pyarrow
+		self.pq = pyarrow.parquet
+		self.writer = None
+
+	def writeRows(self, rows:list):
+		table = self.pa.Table.from_pylist(rows)
+		if self.writer is None:
+			self.writer = self.pq.ParquetWriter(self.tmp_path, table.schema)
+		self.writer.write_table(table.cast(self.writer.schema))
+
+	def finish(self):
+		if self.writer is not None:
+			self.writer.close()
+			self.writer = None
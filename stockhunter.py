@@ -7,114 +7,719 @@ This program works in two ways:
 """
 import logging
 import config
+import os
 import argparse
-import utils
 import time
-from collector import Collector
+import socket
+import multiprocessing
+import utils
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collector import Collector, YahooCollector
+from candlestore import CandleStore, normalize_candles
 from daterange import DateRange
-from analyzer import Analyzer
-from risk_calculator import RiskCalculator
-from filter import Filter
+from filter import CompiledFilter
+from fundamentals import FundamentalsCache, default_cache, set_default_cache
+from sweep import RiskSurface, write_surface
+from backtest import WalkForwardBacktest, write_calibration
+from server import Screener, serve
+from universestore import UniverseStore
+from instrumentation import default_instrumentation
+from streaming import TickerStream, StreamStore
+from pipeline import TickerResult, analyze_fused
+from sink import ResultsSink
+from prescreen import prescreen
+from journal import Journal
+from workqueue import WorkQueue, make_shards
+from ranking import Scorer, TopK, parse_weights
+from resultcache import default_result_cache
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+metrics = default_instrumentation()
+
+def filter_tickers(tickers, lookup_filter) -> tuple:
+	"""Return tickers passing the lookup filter, before any candles are downloaded"""
+	utils.pprint(f"Applying filter to {len(tickers)} tickers...")
+	with metrics.stage("filter"):
+		passed = CompiledFilter(lookup_filter).select(tickers, workers=config.IO_WORKERS)
+	metrics.count("tickers_filtered", len(tickers) - len(passed))
+	utils.pprint(f"{len(passed)} tickers passed filter")
+	return passed
+
+def analyze_ticker(ticker, df, args, days, current_price=None) -> TickerResult:
+	"""Run fused analysis and risk calculation for a single ticker
+
+	Current price is looked up when not given.
+	Returns None if the ticker data can not be analyzed.
+	"""
+	utils.pprint(f"Starting data analysis for {ticker}...")
+	if current_price is None:
+		with metrics.stage("price_lookup"):
+			current_price = YahooCollector.getPrice(ticker)
+	cache = default_result_cache() if args.result_cache else None
+	hits = cache.hits if cache is not None else 0
+	try:
+		with metrics.stage("analysis"):
+			result = analyze_fused(ticker, df, args.gains, days, current_price, cache)
+	except (ValueError, KeyError) as e:
+		utils.pprint(f"Skipping {ticker} analysis: {e}")
+		return None
+	if cache is not None:
+		metrics.count("result_cache_hits" if cache.hits > hits else "result_cache_misses")
+	metrics.count("rows_analyzed", result.candles)
+
+	utils.pprint(f"Risk: {round(result.risk, 2)}%")
+	if result.entry_risk is None:
+		utils.pprint("Price entry risk: n/a, no winning entry points")
+	else:
+		utils.pprint(f"Price entry risk: {round(result.entry_risk, 2)}%")
+	return result
+
+def analyze_ticker_profiled(ticker, df, args, days, current_price=None) -> TickerResult:
+	"""Run analyze_ticker, under cProfile if ticker is --profile-ticker"""
+	if ticker != args.profile_ticker:
+		return analyze_ticker(ticker, df, args, days, current_price)
+	with metrics.profile(config.PROFILE_FILE.format(ticker=ticker)):
+		return analyze_ticker(ticker, df, args, days, current_price)
+
+def analyze_ticker_measured(ticker, df, args, days, current_price=None) -> tuple:
+	"""Run analyze_ticker in a worker process, return result and worker metrics"""
+	metrics.enabled = args.metrics
+	metrics.reset()
+	result = analyze_ticker_profiled(ticker, df, args, days, current_price)
+	return result, metrics.snapshot()
+
+def stage_universe(frames, universe):
+	"""Write collected frames into the universe store, yield zero-copy views instead"""
+	for ticker, df, error in frames:
+		if error is None:
+			try:
+				universe.write(ticker, df)
+				df = universe.getCandles(ticker)
+			except ValueError as e:
+				df, error = None, e
+		yield ticker, df, error
+
+def scan_serial(col, frames, args, days):
+	"""Yield analysis results ticker by ticker"""
+	for ticker, df, error in frames:
+		print()
+		print(f"[ {ticker} analysis from {col.start_date} to {col.end_date}, gains={args.gains}%, period={args.period} ]")
+		if error is not None:
+			print(f"Skipping {ticker}: {error}")
+			metrics.count("tickers_skipped")
+			continue
+
+		# A failed price lookup skips the ticker, as in scan_parallel
+		try:
+			current_price = lookup_price(col, ticker)
+		except Exception as e:
+			print(f"Skipping {ticker}: {e}")
+			metrics.count("tickers_skipped")
+			continue
+		result = analyze_ticker_profiled(ticker, df, args, days, current_price)
+		if result is None:
+			metrics.count("tickers_skipped")
+			continue
+		yield result
+
+def init_worker():
+	"""Configure logging in analysis worker processes"""
+	logging.basicConfig(format=config.LOG_FORMAT, filename=config.LOG_FILE)
+
+def pool_context():
+	"""Return a multiprocessing context whose workers do not inherit locks
+
+	Forked workers copy locks held by other threads at fork time, e.g. the
+	import lock of a lazy pandas import, and deadlock on them.
+	"""
+	if "forkserver" in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context("forkserver")
+	return multiprocessing.get_context("spawn")
+
+def lookup_price(col, ticker) -> float:
+	"""Look up current price of a ticker on an I/O thread"""
+	with metrics.stage("price_lookup"):
+		return col.getPrice(ticker)
+
+def submit_analysis(cpu_pool, ticker, df, args, days, price_lookup):
+	"""Wait for the price lookup, then queue ticker analysis on the CPU pool
+
+	Called from the main thread only, so worker processes are never started
+	from an I/O thread.
+	"""
+	return cpu_pool.submit(analyze_ticker_measured, ticker, df, args, days, price_lookup.result())
+
+def collect_analysis(ticker, submitted) -> TickerResult:
+	"""Wait for a submitted analysis, return its result or None"""
+	try:
+		result, worker_metrics = submitted.result()
+	except Exception as e:
+		print(f"Skipping {ticker}: {e}")
+		metrics.count("tickers_skipped")
+		return None
+	metrics.merge(worker_metrics)
+	if result is None:
+		metrics.count("tickers_skipped")
+	return result
+
+def scan_parallel(col, frames, args, days, max_pending:int=None):
+	"""Yield analysis results in ticker order
+
+	Analysis and risk stages run in a process pool, price lookups in a
+	bounded thread pool while the next chunks download. A ticker moves to
+	the process pool once its price is known. With max_pending, at most
+	that many tickers' candles are held by lookups and queued analyses.
+	"""
+	with ProcessPoolExecutor(max_workers=args.workers, mp_context=pool_context(), initializer=init_worker) as cpu_pool, \
+			ThreadPoolExecutor(max_workers=config.IO_WORKERS) as io_pool:
+		lookups, pending = deque(), deque()
+
+		def submit_priced(wait:bool):
+			"""Move tickers with a known price from lookups to pending, waiting for the first one if wait"""
+			while lookups and (wait or lookups[0][2].done()):
+				ticker, df, price_lookup = lookups.popleft()
+				wait = False
+				try:
+					pending.append((ticker, submit_analysis(cpu_pool, ticker, df, args, days, price_lookup)))
+				except Exception as e:
+					print(f"Skipping {ticker}: {e}")
+					metrics.count("tickers_skipped")
+
+		for ticker, df, error in frames:
+			if error is not None:
+				print(f"Skipping {ticker}: {error}")
+				metrics.count("tickers_skipped")
+				continue
+			lookups.append((ticker, df, io_pool.submit(lookup_price, col, ticker)))
+			del df
+			submit_priced(wait=False)
+			while max_pending and len(lookups) + len(pending) >= max_pending:
+				if not pending:
+					submit_priced(wait=True)
+					continue
+				result = collect_analysis(*pending.popleft())
+				if result is not None:
+					yield result
+
+		while lookups or pending:
+			if not pending:
+				submit_priced(wait=True)
+				continue
+			result = collect_analysis(*pending.popleft())
+			if result is not None:
+				yield result
+
+def scan_bounded(col, tickers, args, days, universe=None):
+	"""Yield analysis results chunk by chunk, keeping RSS under --max-rss MiB
+
+	Every chunk is collected, analyzed and released before the next one
+	is downloaded. Chunks shrink while RSS is over budget and grow back
+	up to config.CHUNK_SIZE while it is under half of it.
+	"""
+	budget = args.max_rss * 2**20
+	chunk_size = config.CHUNK_SIZE
+	done = 0
+	while done < len(tickers):
+		chunk = tickers[done:done + chunk_size]
+		done += len(chunk)
+		frames = col.getDataBatch(chunk)
+		if universe is not None:
+			frames = stage_universe(frames, universe)
+		if args.workers > 1:
+			results = scan_parallel(col, frames, args, days, max_pending=2 * args.workers)
+		else:
+			results = scan_serial(col, frames, args, days)
+		yield from results
+		del frames, results
+		utils.release_memory()
+
+		rss = utils.current_rss()
+		metrics.count("chunks_scanned")
+		if rss > budget and chunk_size > 1:
+			chunk_size = max(1, chunk_size // 2)
+			logger.info(f"RSS {rss >> 20} MiB over budget, chunk size lowered to {chunk_size}")
+		elif rss > budget:
+			logger.error(f"RSS {rss >> 20} MiB over budget of {args.max_rss} MiB with single ticker chunks")
+		elif rss < budget / 2 and chunk_size < config.CHUNK_SIZE:
+			chunk_size = min(config.CHUNK_SIZE, chunk_size * 2)
+
+def build_collector(args, start_date, end_date) -> Collector:
+	"""Create collector selected by command line arguments"""
+	if args.collector == "file":
+		col = Collector("file", start_date, end_date, path=args.data_dir, batch_size=args.batch_size)
+		# Serve fundamentals from the local snapshot so filters and price lookups stay offline
+		set_default_cache(FundamentalsCache(fetch=col.col.getInfo, max_size=config.FUNDAMENTALS_CACHE_SIZE))
+		return col
+	store = None if args.no_cache else CandleStore(config.CANDLE_STORE_DIR)
+	return Collector(
+		args.collector, start_date, end_date, store=store, offline=args.offline,
+		batch_size=args.batch_size, sleep=config.SLEEP, rate=args.rate,
+		concurrency=config.MAX_CONCURRENCY, retries=config.RETRIES
+	)
+
+def sweep(args):
+	"""Calculate rising edge risk for every gains/period combination
+
+	Candles are loaded once per ticker for the longest sampling window.
+	"""
+	gains_list = [int(gains) for gains in args.sweep_gains.split(",")]
+	periods = args.sweep_periods.split(",")
+	periods_days = [DateRange.periodToDays(period) for period in periods]
+	start_dates = [DateRange(period, args.multiple).start_date for period in periods]
+	start_date, end_date = min(start_dates), DateRange.getCurrentDate()
+
+	col = build_collector(args, start_date, end_date)
+	tickers = utils.load_tickers(args.tickers)
+
+	surfaces = {}
+	for ticker, df, error in col.getDataBatch(tickers):
+		print()
+		print(f"[ {ticker} risk sweep from {start_date} to {end_date}, gains={gains_list}%, periods={periods} ]")
+		if error is not None:
+			print(f"Skipping {ticker}: {error}")
+			continue
+		surface = RiskSurface(df, gains_list, periods_days, start_dates)
+		try:
+			surface.calculate()
+		except ValueError as e:
+			print(f"Skipping {ticker}: {e}")
+			continue
+		surfaces[ticker] = surface
+		risk = surface.getRisk()
+		for gi, gains in enumerate(gains_list):
+			for pi, period in enumerate(periods):
+				utils.pprint(f"gains={gains}% period={period} risk={round(float(risk[gi, pi]), 2)}%")
+
+	write_surface(config.SURFACE_FILE, surfaces)
+	utils.pprint(f"Risk surface written to {config.SURFACE_FILE}")
+
+def backtest(args):
+	"""Walk-forward backtest of rising edge risk against realized gains
+
+	Every sampling window in --history is scored and checked against an
+	entry at the candle following it, results are written as a per-ticker
+	calibration table of predicted against realized risk.
+	"""
+	days = DateRange.periodToDays(args.period)
+	lookback_days = days * args.multiple
+	end_date = DateRange.getCurrentDate()
+	start_date = DateRange(args.history).start_date
+
+	col = build_collector(args, start_date, end_date)
+	tickers = utils.load_tickers(args.tickers)
+
+	backtests = {}
+	for ticker, df, error in col.getDataBatch(tickers):
+		print()
+		print(f"[ {ticker} backtest from {start_date} to {end_date}, gains={args.gains}%, period={args.period} ]")
+		if error is not None:
+			print(f"Skipping {ticker}: {error}")
+			continue
+		with metrics.stage("backtest"):
+			bt = WalkForwardBacktest(df, args.gains, days, lookback_days)
+			try:
+				bt.calculate()
+			except ValueError as e:
+				print(f"Skipping {ticker}: {e}")
+				continue
+		backtests[ticker] = bt
+		for low, high, count, predicted, realized in bt.calibration(args.buckets):
+			if count:
+				utils.pprint(f"risk {round(low)}-{round(high)}%: {count} windows, predicted {round(predicted, 2)}%, realized {round(realized, 2)}%")
+
+	write_calibration(config.BACKTEST_FILE, backtests, args.buckets)
+	utils.pprint(f"Calibration table written to {config.BACKTEST_FILE}")
+
+def run_server(args):
+	"""Serve analysis and lookup queries from candles kept in memory"""
+	tickers = utils.load_tickers(args.tickers)
+	history_days = DateRange.periodToDays(args.history)
+	screener = Screener(
+		tickers, lambda start_date, end_date: build_collector(args, start_date, end_date), history_days,
+		default_result_cache() if args.result_cache else None
+	)
+	utils.pprint(f"Loading {len(tickers)} tickers, serving on http://{args.host}:{args.port}")
+	serve(screener, args.host, args.port, args.refresh)
+
+def load_replay(filename) -> dict:
+	"""Load replay CSV with Date,Ticker,Open,High,Low,Close,Volume columns into ticker -> candles"""
+	import pandas as pd
+	rows = pd.read_csv(filename, parse_dates=["Date"])
+	return {ticker: candles.drop(columns="Ticker").set_index("Date").sort_index() for ticker, candles in rows.groupby("Ticker")}
+
+def watch(args):
+	"""Keep risks up to date, analyzing only candles added since the last update
+
+	Ticker state is bootstrapped once from the -p/-m sampling window and
+	persisted between runs. Polls the collector every --interval seconds,
+	or replays candles from a local file with --replay. Risk is computed
+	over an expanding history: appended candles are added to the
+	bootstrapped window and old candles never leave it.
+	"""
+	days = DateRange.periodToDays(args.period)
+	streams = StreamStore(config.STREAM_STATE_DIR)
+	tickers = utils.load_tickers(args.tickers)
+	replay = load_replay(args.replay) if args.replay else None
+
+	while True:
+		start_date, end_date = DateRange(args.period, args.multiple).getRange()
+		col = build_collector(args, start_date, end_date)
+		if replay is not None:
+			frames = ((ticker, replay.get(ticker), None if ticker in replay else ValueError("Not in replay file")) for ticker in tickers)
+		else:
+			frames = col.getDataBatch(tickers)
+
+		for ticker, df, error in frames:
+			if error is not None:
+				print(f"Skipping {ticker}: {error}")
+				continue
+			# Streams step through DataFrame records, the file collector returns column views
+			df = normalize_candles(df)
+			# Replay files hold more than the sampling window
+			dates = df.index.values.astype("datetime64[D]")
+			df = df[(dates >= np.datetime64(start_date, "D")) & (dates < np.datetime64(end_date, "D"))]
+			stream = streams.load(ticker, args.gains, days)
+			if stream is None:
+				stream = TickerStream.fromHistory(ticker, df, args.gains, days)
+				appended = len(df)
+			else:
+				appended = stream.appendFrame(df)
+			if appended == 0 or stream.risk.total == 0:
+				continue
+			streams.save(stream)
+
+			# A failed price lookup skips the ticker, as in scan_serial
+			try:
+				current_price = float(df["Close"].iloc[-1]) if replay is not None else lookup_price(col, ticker)
+			except Exception as e:
+				print(f"Skipping {ticker}: {e}")
+				continue
+			risk = stream.risk.getRisk()
+			try:
+				entry_risk = round(stream.risk.getEntryRisk(current_price, stream.averages.getAvgPrice()), 2)
+			except ValueError:
+				entry_risk = "n/a"
+			print(f"[ {ticker} {stream.last_date}, +{appended} candles ] Risk: {round(risk, 2)}%, Price entry risk: {entry_risk}%")
+
+		if replay is not None or args.interval <= 0:
+			break
+		time.sleep(args.interval)
+
+def scan_params(args, days, start_date, end_date) -> dict:
+	"""Return scan parameters written with every result row"""
+	return {
+		"operation":args.operation,
+		"gains":args.gains,
+		"period":args.period,
+		"period_days":days,
+		"multiple":args.multiple,
+		"risk_appetite":args.risk_appetite,
+		"start_date":start_date.isoformat(),
+		"end_date":end_date.isoformat()
+	}
+
+def queue_params(args) -> dict:
+	"""Return scan parameters every worker of a queue must share"""
+	return {
+		"operation":args.operation,
+		"gains":args.gains,
+		"period":args.period,
+		"multiple":args.multiple,
+		"risk_appetite":args.risk_appetite
+	}
+
+def build_ranker(args) -> TopK:
+	"""Create top-k ranker of candidates selected by command line arguments, None without --top"""
+	if not args.top:
+		return None
+	weights = parse_weights(args.rank_weights) if args.rank_weights else config.RANK_WEIGHTS
+	return TopK(args.top, Scorer(weights, missing_value=config.RANK_MISSING_VALUE))
+
+def write_ranking(ranker:TopK, filename=config.RANKING_FILE):
+	"""Write ranked candidates best first and print them"""
+	ranking = ranker.ranking()
+	with ResultsSink(ResultsSink.typeFromFilename(filename), filename, buffer_size=config.RESULTS_BUFFER_SIZE) as sink:
+		for row in ranking:
+			sink.write(row)
+	utils.pprint(f"Top {len(ranking)} of {ranker.seen} candidates:")
+	for row in ranking:
+		print(f"{row['rank']:>4}. {row['ticker']} score {row['score']}, risk {round(row['risk'], 2)}%, entry risk {row['entry_risk']}")
+
+def build_queue(args) -> WorkQueue:
+	"""Create work queue selected by command line arguments"""
+	return WorkQueue(
+		args.queue_type, args.queue, lease_seconds=config.QUEUE_LEASE_SECONDS, max_attempts=config.QUEUE_MAX_ATTEMPTS
+	)
+
+def work(args):
+	"""Lease shards from the work queue and analyze them until every shard is finished
+
+	The lease is renewed after every analyzed ticker. While other workers
+	hold the last leases, keeps polling to take over those that expire.
+	"""
+	queue = build_queue(args)
+	if queue.getParams() != queue_params(args):
+		logger.error("Worker parameters differ from the queue's")
+		raise ValueError(f"Worker parameters differ from the queue's {queue.getParams()}")
+	worker = f"{socket.gethostname()}:{os.getpid()}"
+	days = DateRange.periodToDays(args.period)
+	while True:
+		leased = queue.lease(worker)
+		if leased is None:
+			if queue.status()["leased"] == 0:
+				break
+			time.sleep(config.QUEUE_POLL)
+			continue
+		shard_id, tickers = leased
+		utils.pprint(f"Worker {worker} leased shard {shard_id} with {len(tickers)} tickers")
+		start_date, end_date = DateRange(args.period, args.multiple).getRange()
+		col = build_collector(args, start_date, end_date)
+		run_params = scan_params(args, days, start_date, end_date)
+		if args.operation == "lookup":
+			tickers = filter_tickers(tickers, config.LOOKUP_FILTER)
+		frames = col.getDataBatch(tickers)
+		if args.workers > 1:
+			results = scan_parallel(col, frames, args, days)
+		else:
+			results = scan_serial(col, frames, args, days)
+		rows = []
+		for result in results:
+			metrics.count("tickers_analyzed")
+			rows.append({**result._asdict(), "candidate":bool(result.risk <= args.risk_appetite), **run_params})
+			queue.renew(shard_id, worker)
+		queue.complete(shard_id, worker, rows)
+	default_cache().save()
+
+def coordinate(args):
+	"""Split tickers into shards, wait for workers and merge their results
+
+	--local-workers worker processes are started here, workers on other
+	nodes join by running the same command with --worker. Local workers
+	that all died are restarted while shards are left.
+	"""
+	tickers = utils.load_tickers(args.tickers)
+	queue = build_queue(args)
+	queue.create(queue_params(args), make_shards(tickers, args.shard_size))
+	utils.pprint(f"Queued {len(tickers)} tickers in shards of {args.shard_size} at {args.queue}")
+
+	processes = []
+	while True:
+		status = queue.status()
+		if status["pending"] == 0 and status["leased"] == 0:
+			break
+		if args.local_workers > 0 and not any(process.is_alive() for process in processes):
+			processes = [multiprocessing.Process(target=work, args=(args,)) for _ in range(args.local_workers)]
+			for process in processes:
+				process.start()
+		time.sleep(config.QUEUE_POLL)
+	for process in processes:
+		process.join()
+	if status["failed"]:
+		utils.pprint(f"{status['failed']} shards failed after {config.QUEUE_MAX_ATTEMPTS} attempts")
+
+	# Merge worker results
+	results_file = args.results or config.RESULTS_FILE
+	results_format = args.results_format or ResultsSink.typeFromFilename(results_file)
+	candidates = []
+	ranker = build_ranker(args)
+	with ResultsSink(results_format, results_file, buffer_size=config.RESULTS_BUFFER_SIZE) as sink:
+		for row in queue.results():
+			sink.write(row)
+			if row["candidate"]:
+				candidates.append(row["ticker"])
+				if ranker is not None:
+					ranker.push(row)
+	utils.write_candidates(candidates)
+	if ranker is not None:
+		write_ranking(ranker)
+	utils.pprint(f"Merged {status['done']} shards, {len(candidates)} candidates")
+
 def main(args):
 	# Using desired period, find new sample period
 	start_date, end_date = DateRange(args.period, args.multiple).getRange()
 	days = DateRange.periodToDays(args.period)
 	
-	col = Collector("yahoo", start_date, end_date)
+	col = build_collector(args, start_date, end_date)
 	
 	# Load tickers from file
 	tickers = utils.load_tickers(args.tickers)
 
+	run_params = scan_params(args, days, start_date, end_date)
+	# Sampling dates move with the clock, a scan resumed on a later day keeps its finished results
+	journal_params = {key: value for key, value in run_params.items() if key not in ("start_date", "end_date")}
+	journal_params["tickers"] = args.tickers
+	# Rows of another data source differ, resuming must not replay them
+	journal_params["collector"] = args.collector
+	journal_params["data_dir"] = args.data_dir if args.collector == "file" else None
+	journal_params["universe"] = args.universe
+	journal = Journal(config.JOURNAL_FILE, journal_params, resume=args.resume, sync_every=config.JOURNAL_SYNC_EVERY)
+
 	if args.operation == "lookup":
-		# Lookup filter
-		lookup_filter = {
-			"dividend":False
-		}
-
-	with open(config.CANDIDATES_FILE, "w") as f:
-		pass
-		
+		filtered = journal.get("filter")
+		passed = set(filter_tickers([ticker for ticker in tickers if ticker not in filtered], config.LOOKUP_FILTER))
+		for ticker in tickers:
+			if ticker not in filtered:
+				journal.record(ticker, "filter", ticker in passed)
+		tickers = tuple(ticker for ticker in tickers if filtered[ticker])
+
+	if args.prescreen:
+		# Drop tickers whose cached candles already bound risk above appetite
+		bounds = journal.get("prescreen")
+		with metrics.stage("prescreen"):
+			_, new_bounds = prescreen(
+				[ticker for ticker in tickers if ticker not in bounds], CandleStore(config.CANDLE_STORE_DIR),
+				start_date, end_date, args.gains, days, args.risk_appetite
+			)
+		for ticker, bound in new_bounds.items():
+			journal.record(ticker, "prescreen", bound)
+		survivors = tuple(ticker for ticker in tickers if bounds.get(ticker, 0) <= args.risk_appetite)
+		metrics.count("tickers_prescreened", len(tickers) - len(survivors))
+		utils.pprint(f"Prescreen kept {len(survivors)} of {len(tickers)} tickers, {len(bounds)} bounded from cache")
+		tickers = survivors
+
+	results_file = args.results or config.RESULTS_FILE
+	results_format = args.results_format or ResultsSink.typeFromFilename(results_file)
+	sink = ResultsSink(results_format, results_file, buffer_size=config.RESULTS_BUFFER_SIZE)
+
 	# For each stock do:
 	candidates = []
-	for ticker in tickers:
-		print()
-		print(f"[ {ticker} analysis from {start_date} to {end_date}, gains={args.gains}%, period={args.period} ]")
-		
-		if args.operation == "lookup":
-			utils.pprint("Applying filter...")
-			
-			fil = Filter(ticker).check(lookup_filter)
-			if not fil:
-				utils.pprint(f"Filter failed")
-				continue
-			utils.pprint("Filter passed")
-
-		# Get candle OHLC data
-		time.sleep(config.SLEEP)
-		utils.pprint("Collecting data...")
+	ranker = build_ranker(args)
+	finished = journal.get("analysis")
+	remaining = tuple(ticker for ticker in tickers if ticker not in finished)
+	if finished:
+		utils.pprint(f"Resuming, {len(tickers) - len(remaining)} tickers already analyzed")
+	utils.pprint("Collecting data...")
+	universe = None
+	if args.universe:
 		try:
-			df = col.getData(ticker)
-		except:
-			print(f"Skipping {ticker}")
-			continue
+			calendar = col.getData(config.UNIVERSE_CALENDAR_TICKER).index
+		except Exception as e:
+			logger.error(f"Failed to collect universe calendar: {e}")
+			raise SystemExit(f"Can not build the universe calendar from {config.UNIVERSE_CALENDAR_TICKER}: {e}")
+		universe = UniverseStore.create(args.universe, calendar, len(remaining))
+	if args.max_rss:
+		results = scan_bounded(col, remaining, args, days, universe)
+	else:
+		frames = col.getDataBatch(remaining)
+		if universe is not None:
+			frames = stage_universe(frames, universe)
+		if args.workers > 1:
+			results = scan_parallel(col, frames, args, days)
+		else:
+			results = scan_serial(col, frames, args, days)
+	with sink:
+		# Replay results of tickers finished before a resume
+		for ticker in tickers:
+			if ticker in finished:
+				sink.write(finished[ticker])
+				if finished[ticker]["candidate"]:
+					candidates.append(ticker)
+					if ranker is not None:
+						ranker.push(finished[ticker])
+		for result in results:
+			metrics.count("tickers_analyzed")
+			candidate = bool(result.risk <= args.risk_appetite)
+			if candidate:
+				candidates.append(result.ticker)
+			row = {**result._asdict(), "candidate":candidate, **run_params}
+			sink.write(row)
+			journal.record(result.ticker, "analysis", row)
+			if candidate and ranker is not None:
+				ranker.push(row)
+	journal.close()
+	utils.write_candidates(candidates)
+	if ranker is not None:
+		write_ranking(ranker)
 
-		# Analyze using RisingEdge analyzer
-		utils.pprint(f"Starting data analysis for {ticker}...")
-		try:
-			an = Analyzer(args.analyzer, df, wanted_gain=args.gains, period_days=days)
-		except:
-			utils.pprint(f"Skipping {ticker} analysis")
-			continue
-		an.analyze()
-		rising_edge_results = an.getResult()
-
-		# Get averages
-		an = Analyzer("avg", df)
-		an.analyze()
-		averages = an.getResult()
-
-		# Analyze rolling price to rolling average ratios
-		an = Analyzer("rpa", df, averages=averages["rolling_avg_price"])
-		an.analyze()
-		price_avg_ratios = an.getResult()
-
-		utils.pprint("Calculating risk...")
-		rc = RiskCalculator(args.analyzer, rising_edge_results)
-		rc.calculateRisk()
-		risk = rc.getRisk()
-		utils.pprint(f"Risk: {round(risk, 2)}%")
-
-		if risk <= args.risk_appetite:
-			candidates.append(ticker)
-			utils.write_candidate(ticker)
-
-		# Calculate entry risk
-		utils.pprint("Calculating entry risk...")
-		input_data = {
-			"ticker":ticker,
-			"avg_price":averages["avg_price"],
-			"rising_edge_data":rising_edge_results,
-			"price_avg_ratios":price_avg_ratios
-		}
-		rc = RiskCalculator("per", input_data)
-		rc.calculateRisk()
-		risk = rc.getRisk()
-		utils.pprint(f"Price entry risk: {round(risk, 2)}%")
+	if universe is not None:
+		universe.flush()
+
+	fundamentals = default_cache()
+	fundamentals.save()
+	logger.info(f"Fundamentals cache stats: {fundamentals.stats()}")
+
+	if args.metrics:
+		stats = fundamentals.stats()
+		metrics.count("fundamentals_cache_hits", stats["hits"])
+		metrics.count("fundamentals_cache_misses", stats["misses"])
+		metrics.writeJson(config.METRICS_JSON_FILE)
+		metrics.writePrometheus(config.METRICS_PROM_FILE)
 
 if __name__ == "__main__":
 	logging.basicConfig(format=config.LOG_FORMAT, filename=config.LOG_FILE)
 	parser = argparse.ArgumentParser()
-	parser.add_argument("-o", "--operation", type=str, help="operation mode", choices=["analysis", "lookup"], default="analysis")
+	parser.add_argument("-o", "--operation", type=str, help="operation mode", choices=["analysis", "lookup", "sweep", "watch", "backtest", "serve"], default="analysis")
 	parser.add_argument("-t", "--tickers", type=str, help="file containing tickers", required=True)
 	parser.add_argument("-a", "--analyzer", type=str, help="analyzer used", choices=["re"], required=True)
-	parser.add_argument("-g", "--gains", type=int, help="\% gains", required=True)
-	parser.add_argument("-r", "--risk-appetite", type=int, help="\% risk appetite", default=50)
-	parser.add_argument("-p", "--period", type=str, help="max waiting period, e.g. 3w, 20d, 2m, 3y", required=True)
+	parser.add_argument("-g", "--gains", type=int, help="%% gains")
+	parser.add_argument("-r", "--risk-appetite", type=int, help="%% risk appetite", default=50)
+	parser.add_argument("-p", "--period", type=str, help="max waiting period, e.g. 3w, 20d, 2m, 3y")
 	parser.add_argument("-m", "--multiple", type=int, help="period multiple for sampling", required=True)
+	parser.add_argument("-c", "--collector", type=str, help="data collector", choices=["yahoo", "yahoo-async", "file"], default="yahoo")
+	parser.add_argument("--data-dir", type=str, help="directory of local candle files for the file collector", default=config.DATA_DIR)
+	parser.add_argument("--rate", type=float, help="max requests per second for the async collector", default=config.RATE_LIMIT)
+	parser.add_argument("-w", "--workers", type=int, help="number of analysis processes", default=1)
+	parser.add_argument("-b", "--batch-size", type=int, help="number of tickers downloaded per request", default=config.BATCH_SIZE)
+	cache_group = parser.add_mutually_exclusive_group()
+	cache_group.add_argument("--offline", action="store_true", help="serve candles only from the local candle store")
+	cache_group.add_argument("--no-cache", action="store_true", help="always download candles, bypass the local candle store")
+	parser.add_argument("--queue", type=str, help="work queue shared with workers, a SQLite file or a directory, coordinates a sharded scan")
+	parser.add_argument("--queue-type", type=str, help="work queue type", choices=["sqlite", "file"], default="sqlite")
+	parser.add_argument("--worker", action="store_true", help="work on shards of the --queue instead of coordinating")
+	parser.add_argument("--shard-size", type=int, help="tickers per shard", default=config.SHARD_SIZE)
+	parser.add_argument("--local-workers", type=int, help="worker processes started by the coordinator", default=0)
+	parser.add_argument("--result-cache", action="store_true", help="reuse analysis results from an on-disk cache, pays off for slow low-gain analyses only")
+	parser.add_argument("--resume", action="store_true", help="resume an interrupted scan from its checkpoint journal")
+	parser.add_argument("--prescreen", action="store_true", help="skip tickers whose cached candles already bound risk above appetite")
+	parser.add_argument("--max-rss", type=int, help="memory budget in MiB, scans in chunks sized to stay under it")
+	parser.add_argument("-u", "--universe", type=str, help="directory of a memory-mapped universe store to load candles into")
+	parser.add_argument("--sweep-gains", type=str, help="comma separated %% gains for sweep, e.g. 5,10,20")
+	parser.add_argument("--sweep-periods", type=str, help="comma separated periods for sweep, e.g. 2w,1m,3m")
+	parser.add_argument("--history", type=str, help="backtested history, e.g. 10y", default=config.BACKTEST_HISTORY)
+	parser.add_argument("--buckets", type=int, help="number of predicted risk buckets in the backtest calibration table", default=config.BACKTEST_BUCKETS)
+	parser.add_argument("--host", type=str, help="server address", default=config.SERVER_HOST)
+	parser.add_argument("--port", type=int, help="server port", default=config.SERVER_PORT)
+	parser.add_argument("--refresh", type=int, help="server data refresh interval in seconds, 0 disables", default=config.SERVER_REFRESH)
+	parser.add_argument("--interval", type=int, help="watch polling interval in seconds, 0 runs once", default=0)
+	parser.add_argument("--replay", type=str, help="CSV file with Date,Ticker,OHLCV candles replayed in watch mode")
+	parser.add_argument("--results", type=str, help="file to write per-ticker results to, defaults to config.RESULTS_FILE")
+	parser.add_argument("--results-format", type=str, help="results file format, guessed from extension by default", choices=["csv", "jsonl", "parquet"])
+	parser.add_argument("--top", type=int, help="rank candidates and write the best TOP to config.RANKING_FILE")
+	parser.add_argument("--rank-weights", type=str, help="composite ranking score weights, lower scores rank first, e.g. risk=1,entry_risk=0.5")
+	parser.add_argument("--metrics", action="store_true", help="write per-stage timings and counters at the end of a scan")
+	parser.add_argument("--profile-ticker", type=str, help="profile analysis of a single ticker with cProfile")
 	args = parser.parse_args()
-	main(args)
+	metrics.enabled = args.metrics
+	if args.prescreen and (args.no_cache or args.collector == "file"):
+		parser.error("--prescreen reads the candle store, it can not be used with --no-cache or the file collector")
+	if args.top is not None and args.top <= 0:
+		parser.error("--top must be positive")
+	if args.rank_weights:
+		try:
+			parse_weights(args.rank_weights)
+		except ValueError as e:
+			parser.error(str(e))
+	if args.operation == "sweep":
+		if not args.sweep_gains or not args.sweep_periods:
+			parser.error("sweep requires --sweep-gains and --sweep-periods")
+		sweep(args)
+	elif args.operation == "serve":
+		run_server(args)
+	else:
+		if args.gains is None or args.period is None:
+			parser.error("the following arguments are required: -g/--gains, -p/--period")
+		if args.operation == "watch":
+			watch(args)
+		elif args.operation == "backtest":
+			backtest(args)
+		elif args.queue and args.worker:
+			work(args)
+		elif args.queue:
+			coordinate(args)
+		else:
+			main(args)
 
@@ -0,0 +1,320 @@
+import os
+import json
+import logging
+import datetime
+import tempfile
+import numpy as np
+from collections import deque
+from analyzer import Analyzer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+def percent(ratio:float) -> float:
+	"""Return percent gain of a price ratio, same arithmetic as RisingEdgeAnalyzer.getPercent"""
+	if ratio > 1:
+		return (ratio * 100) - 100
+	return -1 * (1 - ratio) * 100
+
+
+class IncrementalAverageAnalyzer:
+	"""Expanding average price and volume updated one candle at a time
+
+	Attributes:
+		count: number of candles seen
+		total_price: sum of (High + Low) / 2
+		total_vol: sum of volumes
+	"""
+	def __init__(self, count=0, total_price=0.0, total_vol=0.0):
+		self.count = count
+		self.total_price = total_price
+		self.total_vol = total_vol
+
+	def append(self, candle:dict) -> float:
+		"""Add a candle, return the new rolling average price"""
+		self.count += 1
+		self.total_price += (float(candle["High"]) + float(candle["Low"])) / 2
+		self.total_vol += float(candle["Volume"])
+		return self.getAvgPrice()
+
+	def getAvgPrice(self) -> float:
+		return self.total_price / self.count
+
+	def getAvgVol(self) -> float:
+		return self.total_vol / self.count
+
+	def toDict(self) -> dict:
+		return {"count":self.count, "total_price":self.total_price, "total_vol":self.total_vol}
+
+
+class IncrementalRollingPriceAnalyzer:
+	"""Open price to rolling average price ratio of the latest candle
+
+	Attributes:
+		averages: IncrementalAverageAnalyzer fed with the same candles
+		ratio: latest ratio
+	"""
+	def __init__(self, averages:IncrementalAverageAnalyzer, ratio=None):
+		self.averages = averages
+		self.ratio = ratio
+
+	def append(self, candle:dict) -> float:
+		"""Return ratio for a candle already added to the averages"""
+		self.ratio = float(candle["Open"]) / self.averages.getAvgPrice()
+		return self.ratio
+
+
+class IncrementalRisingEdgeAnalyzer:
+	"""Rising edge analyzer updated one candle at a time
+
+	Keeps the entry points whose period is not complete yet, every append
+	updates them in O(period_days). Completed entry points only leave
+	their rising edge count and price/average ratio to the risk calculator.
+
+	Attributes:
+		wanted_gain: % gain wanted
+		period_days: number of days in a period
+		windows: open entry points as [tmp_gain, count, age, intraday, ratio]
+	"""
+	def __init__(self, wanted_gain, period_days, windows=None):
+		self.wanted_gain = wanted_gain
+		self.period_days = period_days
+		self.windows = deque(windows or [])
+
+	def intraday(self, candle:dict) -> int:
+		"""Return how many times wanted gain fits in the candle's intra-day gain"""
+		high_sell = float(candle["High"]) / float(candle["Open"])
+		low_sell = float(candle["Close"]) / float(candle["Low"])
+		intraday_gain = percent(max(high_sell, low_sell))
+		if intraday_gain >= self.wanted_gain:
+			return int(intraday_gain // self.wanted_gain)
+		return 0
+
+	def append(self, candle:dict, ratio:float) -> list:
+		"""Add a candle, return [(edges, ratio)] of entry points completed by it"""
+		gain = percent(float(candle["Close"]) / float(candle["Open"]))
+		if self.period_days > 0:
+			self.windows.append([0, 0, 0, self.intraday(candle), ratio])
+		for window in self.windows:
+			window[0] += gain
+			if window[0] >= self.wanted_gain:
+				window[1] += 1
+				window[0] -= self.wanted_gain
+			window[2] += 1
+		completed = []
+		while self.windows and self.windows[0][2] >= self.period_days:
+			_, count, _, intraday, entry_ratio = self.windows.popleft()
+			completed.append((count + intraday, entry_ratio))
+		if self.period_days <= 0:
+			completed.append((self.intraday(candle), ratio))
+		return completed
+
+	def openEdges(self) -> list:
+		"""Return [(edges, ratio)] of entry points with an incomplete period"""
+		return [(count + intraday, ratio) for _, count, _, intraday, ratio in self.windows]
+
+
+class IncrementalRERiskCalculator:
+	"""Rising edge and price entry risk over all entry points seen
+
+	Attributes:
+		rising_edge: IncrementalRisingEdgeAnalyzer
+		total: number of entry points
+		failed: completed entry points without rising edges
+		win_count: sum of rising edges of completed winning entry points
+		win_ratios: sum of ratio * edges of completed winning entry points
+	"""
+	def __init__(self, rising_edge:IncrementalRisingEdgeAnalyzer, total=0, failed=0, win_count=0, win_ratios=0.0):
+		self.rising_edge = rising_edge
+		self.total = total
+		self.failed = failed
+		self.win_count = win_count
+		self.win_ratios = win_ratios
+
+	def complete(self, completed:list):
+		"""Account entry points whose period completed"""
+		for edges, ratio in completed:
+			if edges == 0:
+				self.failed += 1
+			else:
+				self.win_count += edges
+				self.win_ratios += ratio * edges
+
+	def getRisk(self) -> float:
+		"""Return rising edge risk, same as RERiskCalculator on the full history"""
+		if self.total == 0:
+			logger.error("No risk calculated")
+			raise ValueError("No risk calculated")
+		failed = self.failed + sum(edges == 0 for edges, _ in self.rising_edge.openEdges())
+		return (failed / self.total) * 100
+
+	def getEntryRisk(self, current_price:float, avg_price:float) -> float:
+		"""Return price entry risk, same formula as PriceEntryRiskCalculator"""
+		counter = self.win_count
+		total_ratios = self.win_ratios
+		for edges, ratio in self.rising_edge.openEdges():
+			if edges > 0:
+				counter += edges
+				total_ratios += ratio * edges
+		if counter == 0:
+			logger.error("No winning entry points")
+			raise ValueError("No winning entry points")
+		average_win_ratio = total_ratios / counter
+		current_price_ratio = current_price / avg_price
+		if current_price_ratio >= 1:
+			return 100
+		elif current_price_ratio < average_win_ratio:
+			return 0
+		return (current_price_ratio - average_win_ratio) / (1 - average_win_ratio) * 100
+
+
+class TickerStream:
+	"""Incremental analysis state of a single ticker
+
+	Attributes:
+		ticker: ticker symbol
+		last_date: date of the last appended candle
+		averages: IncrementalAverageAnalyzer
+		rolling_price: IncrementalRollingPriceAnalyzer
+		rising_edge: IncrementalRisingEdgeAnalyzer
+		risk: IncrementalRERiskCalculator
+	"""
+	def __init__(self, ticker, wanted_gain, period_days):
+		self.ticker = ticker
+		self.last_date = None
+		self.averages = IncrementalAverageAnalyzer()
+		self.rolling_price = IncrementalRollingPriceAnalyzer(self.averages)
+		self.rising_edge = IncrementalRisingEdgeAnalyzer(wanted_gain, period_days)
+		self.risk = IncrementalRERiskCalculator(self.rising_edge)
+
+	def append(self, candle:dict, date:datetime.date=None):
+		"""Add one candle"""
+		self.averages.append(candle)
+		ratio = self.rolling_price.append(candle)
+		self.risk.total += 1
+		self.risk.complete(self.rising_edge.append(candle, ratio))
+		if date is not None:
+			self.last_date = date
+
+	def appendFrame(self, data) -> int:
+		"""Append candles of a DataFrame newer than last_date, return how many"""
+		appended = 0
+		for date, candle in zip(data.index, data.to_dict("records")):
+			date = date.date()
+			if self.last_date is not None and date <= self.last_date:
+				continue
+			self.append(candle, date)
+			appended += 1
+		return appended
+
+	@staticmethod
+	def fromHistory(ticker, data, wanted_gain, period_days):
+		"""Build state from full history with the vectorized analyzers
+
+		Completed entry points are counted in one pass, only the open ones
+		are replayed step by step.
+		"""
+		stream = TickerStream(ticker, wanted_gain, period_days)
+		n = len(data)
+		if n == 0:
+			return stream
+		an = Analyzer("avg", data)
+		an.analyze()
+		averages = an.getResult()
+		high, low, volume = an.an.getColumns("High", "Low", "Volume")
+		an = Analyzer("rpa", data, averages=averages["rolling_avg_price"])
+		an.analyze()
+		ratios = an.getResult()
+		an = Analyzer("re", data, wanted_gain=wanted_gain, period_days=period_days)
+		an.analyze()
+		edges = an.getResult()
+
+		open_from = max(0, n - period_days + 1) if period_days > 0 else n
+		closed_edges = edges[:open_from]
+		wins = closed_edges > 0
+		stream.risk.total = n
+		stream.risk.failed = int(np.count_nonzero(~wins))
+		stream.risk.win_count = int(closed_edges[wins].sum())
+		stream.risk.win_ratios = float(np.dot(ratios[:open_from][wins], closed_edges[wins]))
+		stream.averages.count = n
+		stream.averages.total_price = float(np.cumsum((high + low) / 2)[-1])
+		stream.averages.total_vol = float(np.cumsum(volume)[-1])
+		stream.rolling_price.ratio = float(ratios[-1])
+
+		# Replay open entry points with the reference arithmetic
+		rising_edge = stream.rising_edge
+		records = data.iloc[open_from:].to_dict("records")
+		for j, candle in enumerate(records):
+			window = [0, 0, 0, rising_edge.intraday(candle), float(ratios[open_from + j])]
+			for later in records[j:]:
+				window[0] += percent(float(later["Close"]) / float(later["Open"]))
+				if window[0] >= wanted_gain:
+					window[1] += 1
+					window[0] -= wanted_gain
+				window[2] += 1
+			rising_edge.windows.append(window)
+		stream.last_date = data.index[-1].date()
+		return stream
+
+	def toDict(self) -> dict:
+		"""Return JSON serializable state"""
+		return {
+			"ticker":self.ticker,
+			"last_date":self.last_date.isoformat() if self.last_date else None,
+			"averages":self.averages.toDict(),
+			"ratio":self.rolling_price.ratio,
+			"wanted_gain":self.rising_edge.wanted_gain,
+			"period_days":self.rising_edge.period_days,
+			"windows":[list(window) for window in self.rising_edge.windows],
+			"total":self.risk.total,
+			"failed":self.risk.failed,
+			"win_count":self.risk.win_count,
+			"win_ratios":self.risk.win_ratios
+		}
+
+	@staticmethod
+	def fromDict(state:dict):
+		"""Restore state returned by toDict"""
+		stream = TickerStream(state["ticker"], state["wanted_gain"], state["period_days"])
+		if state["last_date"]:
+			stream.last_date = datetime.date.fromisoformat(state["last_date"])
+		stream.averages = IncrementalAverageAnalyzer(**state["averages"])
+		stream.rolling_price = IncrementalRollingPriceAnalyzer(stream.averages, state["ratio"])
+		stream.rising_edge = IncrementalRisingEdgeAnalyzer(state["wanted_gain"], state["period_days"], state["windows"])
+		stream.risk = IncrementalRERiskCalculator(
+			stream.rising_edge, state["total"], state["failed"], state["win_count"], state["win_ratios"]
+		)
+		return stream
+
+
+class StreamStore:
+	"""Directory of serialized TickerStream states, one JSON file per ticker
+
+	States are keyed by ticker and analysis parameters.
+
+	Attributes:
+		path: store directory
+	"""
+	def __init__(self, path):
+		self.path = path
+		os.makedirs(self.path, exist_ok=True)
+
+	def statePath(self, ticker, wanted_gain, period_days) -> str:
+		name = f"{ticker.replace(os.sep, '_')}_g{wanted_gain}_p{period_days}.json"
+		return os.path.join(self.path, name)
+
+	def load(self, ticker, wanted_gain, period_days) -> TickerStream:
+		"""Return stored state or None"""
+		path = self.statePath(ticker, wanted_gain, period_days)
+		if not os.path.exists(path):
+			return None
+		with open(path, "r") as f:
+			return TickerStream.fromDict(json.load(f))
+
+	def save(self, stream:TickerStream):
+		"""Atomically store state"""
+		path = self.statePath(stream.ticker, stream.rising_edge.wanted_gain, stream.rising_edge.period_days)
+		fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+		with os.fdopen(fd, "w") as f:
+			json.dump(stream.toDict(), f)
+		os.replace(tmp_path, path)
@@ -0,0 +1,95 @@
+import csv
+import logging
+import numpy as np
+from analyzer import RisingEdgeAnalyzer, sliding_max
+from risk_calculator import RERiskCalculator
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class RiskSurface:
+	"""Rising edge risk over a grid of wanted gains and periods
+
+	Per-candle gains, prefix sums and intraday gains are computed once and
+	shared by every combination, window maxima are shared by all gains of
+	a period. An entry point's count only depends on the candles after it,
+	so a period with a shorter sampling window is scored on the tail of
+	the shared arrays and matches a separate run over that window.
+
+	Attributes:
+		data: candle data covering the longest sampling window
+		gains_list: wanted % gains
+		periods_days: periods in days
+		start_dates: first date of each period's sampling window or None
+		risk: array of risks, gains x periods
+	"""
+	def __init__(self, data, gains_list, periods_days, start_dates=None):
+		self.data = data
+		self.gains_list = tuple(gains_list)
+		self.periods_days = tuple(periods_days)
+		self.start_dates = start_dates
+		self.risk = None
+
+	def windowStart(self, period_idx) -> int:
+		"""Return index of the first candle in a period's sampling window"""
+		if self.start_dates is None:
+			return 0
+		index = np.asarray(self.data.index).astype("datetime64[D]")
+		return int(index.searchsorted(np.datetime64(self.start_dates[period_idx], "D")))
+
+	def calculate(self):
+		"""Calculate risk for every gains/period combination"""
+		base = RisingEdgeAnalyzer(self.data, self.gains_list[0], self.periods_days[0])
+		gains = base.getGains()
+		if len(gains) == 0:
+			logger.error("No data for risk surface")
+			raise ValueError("No data for risk surface")
+		intraday = base.getIntradayGains()
+		prefix = np.concatenate(([0.0], np.cumsum(gains)))
+		max_gain = gains.max()
+
+		intraday_counts = []
+		for wanted_gain in self.gains_list:
+			base.wanted_gain = wanted_gain
+			intraday_counts.append(base.countIntradayGains(intraday))
+
+		self.risk = np.empty((len(self.gains_list), len(self.periods_days)))
+		for pi, period_days in enumerate(self.periods_days):
+			start = self.windowStart(pi)
+			best = None
+			for gi, wanted_gain in enumerate(self.gains_list):
+				an = RisingEdgeAnalyzer(self.data, wanted_gain, period_days)
+				if period_days > 0 and 0 < wanted_gain and max_gain < wanted_gain:
+					if best is None:
+						best = sliding_max(prefix[1:], min(period_days, len(gains)))
+					counted = an.countFromBest(gains, prefix, best)
+				else:
+					counted = an.countGains(gains)
+				edges = (counted + intraday_counts[gi])[start:]
+				if len(edges) == 0:
+					self.risk[gi, pi] = np.nan
+					continue
+				rc = RERiskCalculator(edges)
+				rc.calculateRisk()
+				self.risk[gi, pi] = rc.getRisk()
+		logger.info(f"Risk surface:")
+		logger.info(self.risk)
+
+	def getRisk(self) -> np.ndarray:
+		"""Return calculated risk surface"""
+		if self.risk is None:
+			logger.error("No risk surface calculated")
+			raise ValueError("No risk surface calculated")
+		return self.risk
+
+
+def write_surface(filename, surfaces:dict):
+	"""Write ticker -> RiskSurface mapping as a ticker x gain x period CSV table"""
+	with open(filename, "w", newline="") as f:
+		writer = csv.writer(f)
+		writer.writerow(("ticker", "gain", "period_days", "risk"))
+		for ticker, surface in surfaces.items():
+			risk = surface.getRisk()
+			for gi, gain in enumerate(surface.gains_list):
+				for pi, period_days in enumerate(surface.periods_days):
+					writer.writerow((ticker, gain, period_days, round(float(risk[gi, pi]), 4)))
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from analyzer import RisingEdgeAnalyzer
+from benchmark import generate_candles
+
+def analyzer(wanted_gain, period_days):
+	return RisingEdgeAnalyzer({"Open":[1.0]}, wanted_gain, period_days)
+
+def test_nan_gain_stops_entry_points():
+	an = analyzer(5, 3)
+	gains = np.array([1, np.nan, 2, 3])
+	assert an.countGainsReference(tuple(gains)) == (0, 0, 1, 0)
+	assert an.countGains(gains).tolist() == [0, 0, 1, 0]
+
+@pytest.mark.parametrize("seed", range(10))
+def test_count_gains_matches_reference(seed):
+	rng = np.random.default_rng(seed)
+	for _ in range(300):
+		n = int(rng.integers(0, 60))
+		an = analyzer(float(rng.choice([0.5, 1, 2, 5, 0, -1])), int(rng.integers(-1, 70)))
+		gains = rng.normal(0, 2, n)
+		if rng.random() < 0.3:
+			# Integer gains land exactly on thresholds
+			gains = np.round(gains)
+		if n and rng.random() < 0.2:
+			gains[rng.integers(0, n, 3)] = rng.choice([np.nan, np.inf, -np.inf, 10])
+		expected = an.countGainsReference(tuple(gains))
+		assert an.countGains(gains).tolist() == list(expected)
+
+@pytest.mark.parametrize("wanted_gain,period_days", [(1, 10), (2, 30), (5, 10), (20, 60)])
+def test_count_gains_matches_reference_on_candles(wanted_gain, period_days):
+	an = RisingEdgeAnalyzer(generate_candles(1000, wanted_gain), wanted_gain, period_days)
+	gains = an.getGains()
+	assert an.countGains(gains).tolist() == list(an.countGainsReference(tuple(gains)))
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analyzer import RisingEdgeAnalyzer
+from backtest import WalkForwardBacktest
+from benchmark import generate_candles
+from risk_calculator import RERiskCalculator
+
+def brute_force_risk(data, wanted_gain, period_days, lookback_days, end):
+	"""Risk of the window ending before candle end, analyzed on its own"""
+	dates = data.index
+	window = data[(dates >= dates[end] - pd.Timedelta(days=lookback_days)) & (dates < dates[end])]
+	an = RisingEdgeAnalyzer(window, wanted_gain, period_days)
+	an.analyze()
+	return RERiskCalculator.failedPercent(an.getResult())
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("bad_value", [None, np.nan, np.inf, 0.0])
+@pytest.mark.parametrize("wanted_gain,period_days", [(2, 10), (5, 20)])
+def test_windows_match_brute_force(bad_value, wanted_gain, period_days):
+	data = generate_candles(400, 3)
+	if bad_value is not None:
+		# A NaN gain, a -100% gain and an infinite gain from a zero Open
+		data.iloc[50, data.columns.get_loc("Open")] = bad_value
+	bt = WalkForwardBacktest(data, wanted_gain, period_days, lookback_days=60)
+	bt.calculate()
+	assert len(bt.ends) > 300
+	expected = [brute_force_risk(data, wanted_gain, period_days, 60, end) for end in bt.ends]
+	np.testing.assert_allclose(bt.getRisk(), expected)
@@ -0,0 +1,82 @@
+import datetime
+import pandas as pd
+import pytest
+from candlestore import CandleStore
+from collector import Collector
+
+class FakeDownload:
+	"""yf.download stand-in, candle values change between calls like a completing last candle"""
+	def __init__(self, scale=1.0):
+		self.calls = []
+		self.scale = scale
+
+	def __call__(self, tickers, start, end, progress=False, group_by=None):
+		self.calls.append((tickers, start, end))
+		version = len(self.calls)
+		dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+		close = [(100.0 + i + version / 10) * self.scale for i in range(len(dates))]
+		frame = pd.DataFrame({"Open":100.0 * self.scale, "High":200.0 * self.scale, "Low":50.0 * self.scale, "Close":close, "Volume":1000.0}, index=dates)
+		if isinstance(tickers, list):
+			return pd.concat({ticker: frame for ticker in tickers}, axis=1)
+		return frame
+
+def assert_same_candles(left, right):
+	"""Compare candle values and dates, stored indexes may differ in resolution"""
+	assert list(left.index.date) == list(right.index.date)
+	for field in ("Open", "High", "Low", "Close", "Volume"):
+		assert list(left[field]) == list(right[field])
+
+def collector(store, download, start, end, **kwargs):
+	return Collector("yahoo", start, end, store=store, download=download, **kwargs)
+
+def test_tail_refresh_downloads_only_from_last_candle(tmp_path):
+	store = CandleStore(str(tmp_path))
+	download = FakeDownload()
+	start, first_end = datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)
+	first = collector(store, download, start, first_end).getData("AAA")
+	last_date = first.index[-1].date()
+
+	end = datetime.date(2024, 3, 1)
+	second = collector(store, download, start, end).getData("AAA")
+	assert download.calls[-1][1] == last_date
+	# The refetched last candle replaced the stored one, older candles were kept
+	assert second.loc[pd.Timestamp(last_date), "Close"] != first.loc[pd.Timestamp(last_date), "Close"]
+	assert_same_candles(second.iloc[:len(first) - 1], first.iloc[:-1])
+	assert second.index[-1] < pd.Timestamp(end)
+
+	data, covered_start, covered_end = store.load("AAA")
+	assert (covered_start, covered_end) == (start, end)
+	assert len(data) == len(second)
+
+def test_batch_tail_refresh_matches_single(tmp_path):
+	start, end = datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)
+	single = collector(CandleStore(str(tmp_path / "single")), FakeDownload(), start, end).getData("AAA")
+	batch_store = CandleStore(str(tmp_path / "batch"))
+	download = FakeDownload()
+	batch = dict((ticker, data) for ticker, data, _ in collector(batch_store, download, start, end, batch_size=2).getDataBatch(["AAA", "BBB"]))
+	assert_same_candles(batch["AAA"], single)
+	assert len(download.calls) == 1
+
+def test_offline_never_downloads(tmp_path):
+	store = CandleStore(str(tmp_path))
+	start, end = datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)
+	cached = collector(store, FakeDownload(), start, end).getData("AAA")
+	download = FakeDownload()
+	offline = collector(store, download, start, end, offline=True).getData("AAA")
+	assert_same_candles(offline, cached)
+	assert download.calls == []
+
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_adjusted_prices_refetch_window(tmp_path, batch_size):
+	store = CandleStore(str(tmp_path))
+	start, end = datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)
+	collector(store, FakeDownload(), start, end).getData("AAA")
+
+	# A split halves every price, including the stored ones
+	download = FakeDownload(scale=0.5)
+	later = collector(store, download, start, datetime.date(2024, 3, 1), **({"batch_size":batch_size} if batch_size else {}))
+	data = later.getData("AAA") if batch_size is None else next(iter(later.getDataBatch(["AAA"])))[1]
+	assert download.calls[-1][1] == start
+	assert (data["Open"] == 50.0).all()
+	stored, covered_start, _ = store.load("AAA")
+	assert (stored["Open"] == 50.0).all() and covered_start == start
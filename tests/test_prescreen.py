@@ -0,0 +1,42 @@
+import datetime
+import numpy as np
+import pandas as pd
+from benchmark import generate_candles
+from pipeline import analyze_fused
+from prescreen import risk_bound
+
+def full_risk(data, start_date, end_date, wanted_gain, period_days):
+	dates = data.index.values.astype("datetime64[D]")
+	window = data[(dates >= np.datetime64(start_date, "D")) & (dates < np.datetime64(end_date, "D"))]
+	return analyze_fused("T", window, wanted_gain, period_days, current_price=1.0).risk
+
+def test_incomplete_last_candle():
+	# Last cached candle was stored flat, it completed with a +10% gain
+	dates = pd.bdate_range("2024-01-01", periods=10)
+	flat = pd.DataFrame({"Open":1.0, "High":1.0, "Low":1.0, "Close":1.0, "Volume":1.0}, index=dates)
+	complete = flat.copy()
+	complete.iloc[-1] = [1.0, 1.1, 1.0, 1.1, 1.0]
+	start_date, end_date = dates[0].date(), dates[-1].date() + datetime.timedelta(days=1)
+	bound = risk_bound(flat, start_date, end_date, start_date, end_date, 5, 3)
+	assert bound <= full_risk(complete, start_date, end_date, 5, 3)
+
+def test_bound_never_above_full_analysis():
+	rng = np.random.default_rng(0)
+	for case in range(300):
+		data = generate_candles(int(rng.integers(20, 200)), seed=case, start="2020-01-01")
+		wanted_gain = int(rng.integers(1, 10))
+		period_days = int(rng.integers(1, 30))
+		dates = [date.date() for date in data.index]
+		# Cache a prefix whose last candle may have been incomplete when stored
+		cut = len(data) if rng.random() < 0.5 else int(rng.integers(1, len(data) + 1))
+		cached = data.iloc[:cut].copy()
+		last = cached.iloc[-1]
+		close = last["Open"] if rng.random() < 0.5 else last["Open"] * rng.uniform(0.9, 1.1)
+		cached.iloc[-1] = [last["Open"], max(last["Open"], close), min(last["Open"], close), close, last["Volume"]]
+		covered_start = dates[int(rng.integers(0, cut))] if rng.random() < 0.3 else dates[0]
+		covered_end = dates[cut - 1] + datetime.timedelta(days=1)
+		start_date = dates[int(rng.integers(0, len(dates)))]
+		end_date = dates[-1] + datetime.timedelta(days=1)
+
+		bound = risk_bound(cached, covered_start, covered_end, start_date, end_date, wanted_gain, period_days)
+		assert bound <= full_risk(data, start_date, end_date, wanted_gain, period_days) + 1e-9, case
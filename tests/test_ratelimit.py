@@ -0,0 +1,68 @@
+import time
+import asyncio
+import datetime
+import pandas as pd
+import pytest
+from collector import AsyncYahooCollector
+from ratelimit import TokenBucket, retry
+
+def test_token_bucket_limits_rate():
+	async def acquire_all(bucket, count):
+		for _ in range(count):
+			await bucket.acquire()
+
+	bucket = TokenBucket(rate=20, capacity=1)
+	start = time.monotonic()
+	asyncio.run(acquire_all(bucket, 6))
+	# First token is free, the other five wait 1/20s each
+	assert time.monotonic() - start >= 5 / 20 * 0.9
+
+def test_token_bucket_disabled():
+	start = time.monotonic()
+	asyncio.run(TokenBucket(rate=0).acquire())
+	assert time.monotonic() - start < 0.05
+
+class FlakyProvider:
+	"""Fails the first failures calls, then returns value"""
+	def __init__(self, failures, value="ok"):
+		self.failures = failures
+		self.value = value
+		self.calls = 0
+
+	async def __call__(self):
+		self.calls += 1
+		if self.calls <= self.failures:
+			raise ConnectionError(f"failure {self.calls}")
+		return self.value
+
+def test_retry_recovers():
+	provider = FlakyProvider(failures=2)
+	assert asyncio.run(retry(provider, retries=3, base_delay=0.001, max_delay=0.01)) == "ok"
+	assert provider.calls == 3
+
+def test_retry_gives_up():
+	provider = FlakyProvider(failures=10)
+	with pytest.raises(ConnectionError):
+		asyncio.run(retry(provider, retries=2, base_delay=0.001, max_delay=0.01))
+	assert provider.calls == 3
+
+def test_async_collector_retries_failed_downloads():
+	failures = {"AAA":2, "BBB":0, "CCC":5}
+	calls = {}
+
+	def download(ticker, start, end, progress=False):
+		calls[ticker] = calls.get(ticker, 0) + 1
+		if calls[ticker] <= failures[ticker]:
+			raise ConnectionError(f"{ticker} failed")
+		dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+		return pd.DataFrame({"Open":1.0, "High":1.0, "Low":1.0, "Close":1.0, "Volume":1.0}, index=dates)
+
+	col = AsyncYahooCollector(
+		datetime.date(2024, 1, 1), datetime.date(2024, 2, 1), download=download,
+		rate=100, concurrency=2, retries=3, backoff=0.001, max_backoff=0.01
+	)
+	results = {ticker: (data, error) for ticker, data, error in col.getCandleDataBatch(tuple(failures), 1)}
+	assert results["AAA"][1] is None and len(results["AAA"][0]) == 23
+	assert results["BBB"][1] is None
+	assert isinstance(results["CCC"][1], ConnectionError)
+	assert calls == {"AAA":3, "BBB":1, "CCC":4}
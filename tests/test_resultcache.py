@@ -0,0 +1,20 @@
+from benchmark import generate_candles
+from pipeline import analyze_fused
+from resultcache import ResultCache
+
+def test_cached_results_match_uncached(tmp_path):
+	cache = ResultCache(str(tmp_path), max_bytes=2**20)
+	data = generate_candles(500, 7)
+	expected = analyze_fused("T", data, 2, 14, 50.0)
+	assert analyze_fused("T", data, 2, 14, 50.0, cache) == expected
+	# The entry risk is recalculated from the current price on a hit
+	assert analyze_fused("T", data, 2, 14, 80.0, cache) == analyze_fused("T", data, 2, 14, 80.0)
+	assert (cache.hits, cache.misses) == (1, 1)
+
+def test_changed_candle_misses(tmp_path):
+	cache = ResultCache(str(tmp_path), max_bytes=2**20)
+	data = generate_candles(500, 7)
+	analyze_fused("T", data, 2, 14, 50.0, cache)
+	data.iloc[-1, data.columns.get_loc("Close")] *= 1.01
+	assert analyze_fused("T", data, 2, 14, 50.0, cache) == analyze_fused("T", data, 2, 14, 50.0)
+	assert (cache.hits, cache.misses) == (0, 2)
@@ -0,0 +1,75 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import pandas as pd
+import pytest
+from http.server import ThreadingHTTPServer
+from benchmark import generate_candles
+from collector import Collector, FileCollector
+from daterange import DateRange
+from pipeline import analyze_fused
+from server import Screener, ScreeningHandler
+
+@pytest.fixture
+def screener(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	data_dir = tmp_path / "data"
+	data_dir.mkdir()
+	start = pd.Timestamp(DateRange.getCurrentDate()) - pd.Timedelta(days=500)
+	fundamentals = {}
+	for seed, ticker in enumerate(("AAA", "BBB")):
+		candles = generate_candles(340, seed, start)
+		FileCollector.writeColumns(str(data_dir), ticker, candles)
+		fundamentals[ticker] = {"currentPrice":float(candles["Close"].iloc[-1]), "volume":1000}
+	(data_dir / "fundamentals.json").write_text(json.dumps(fundamentals))
+
+	def build_collector(start_date, end_date):
+		return Collector("file", start_date, end_date, path=str(data_dir))
+
+	screener = Screener(("AAA", "BBB", "MISSING"), build_collector, history_days=400)
+	screener.refresh()
+	return screener
+
+@pytest.fixture
+def url(screener):
+	httpd = ThreadingHTTPServer(("127.0.0.1", 0), ScreeningHandler)
+	httpd.daemon_threads = True
+	httpd.screener = screener
+	threading.Thread(target=httpd.serve_forever, daemon=True).start()
+	yield f"http://127.0.0.1:{httpd.server_address[1]}"
+	httpd.shutdown()
+	httpd.server_close()
+
+def get(url):
+	with urllib.request.urlopen(url) as response:
+		return json.load(response)
+
+def test_status(url):
+	status = get(url + "/status")
+	assert status["tickers"] == 3
+	assert status["loaded"] == 2
+	assert set(status["failed"]) == {"MISSING"}
+
+def test_analysis_matches_direct_analysis(url, screener):
+	body = get(url + "/analysis?gains=5&period=2w&multiple=10&risk=60")
+	start_date, end_date = DateRange("2w", 10).getRange()
+	col = screener.build_collector(start_date, end_date)
+	expected = {}
+	for ticker, data, error in col.getDataBatch(("AAA", "BBB")):
+		result = analyze_fused(ticker, data, 5, DateRange.periodToDays("2w"), col.getPrice(ticker))
+		expected[ticker] = result._asdict()
+	assert {row["ticker"]: {key: row[key] for key in expected[row["ticker"]]} for row in body["results"]} == expected
+	assert body["candidates"] == [row["ticker"] for row in body["results"] if row["risk"] <= 60]
+	assert set(body["skipped"]) == {"MISSING"}
+
+def test_bad_request(url):
+	with pytest.raises(urllib.error.HTTPError) as error:
+		get(url + "/analysis?period=2w")
+	assert error.value.code == 400
+
+def test_window_longer_than_history(url):
+	with pytest.raises(urllib.error.HTTPError) as error:
+		get(url + "/analysis?gains=5&period=1y&multiple=3")
+	assert error.value.code == 400
+	assert "history" in json.load(error.value)["error"]
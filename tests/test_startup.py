@@ -0,0 +1,7 @@
+from benchmark import STARTUP_BUDGET, startup
+
+def test_cli_import_within_budget():
+	# Fastest of a few fresh interpreters, a single run is noisy
+	measured = startup(repeat=3)
+	assert measured["heavy_modules"] == [], f"importing stockhunter loads {measured['heavy_modules']}"
+	assert measured["seconds"] < STARTUP_BUDGET
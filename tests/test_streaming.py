@@ -0,0 +1,21 @@
+import pytest
+from benchmark import generate_candles
+from pipeline import analyze_fused
+from streaming import TickerStream
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("wanted_gain,period_days", [(1, 5), (5, 14), (20, 30)])
+def test_bootstrap_and_append_match_fused(seed, wanted_gain, period_days):
+	data = generate_candles(300, seed)
+	split = 200 + seed * 7
+	stream = TickerStream.fromHistory("T", data.iloc[:split], wanted_gain, period_days)
+	assert stream.appendFrame(data) == len(data) - split
+	price = float(data["Close"].iloc[-1])
+	expected = analyze_fused("T", data, wanted_gain, period_days, price)
+	assert stream.risk.getRisk() == pytest.approx(expected.risk)
+	assert stream.averages.getAvgPrice() == pytest.approx(expected.avg_price)
+	if expected.entry_risk is None:
+		with pytest.raises(ValueError):
+			stream.risk.getEntryRisk(price, stream.averages.getAvgPrice())
+	else:
+		assert stream.risk.getEntryRisk(price, stream.averages.getAvgPrice()) == pytest.approx(expected.entry_risk)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from benchmark import generate_candles
+from universestore import UniverseStore
+
+def test_candles_round_trip(tmp_path):
+	data = generate_candles(100, 1)
+	store = UniverseStore.create(str(tmp_path), data.index, 2)
+	# A ticker missing some of the shared dates keeps its own candles only
+	store.write("AAA", data)
+	store.write("BBB", data.iloc[::3])
+	for ticker, expected in (("AAA", data), ("BBB", data.iloc[::3])):
+		candles = store.getCandles(ticker)
+		assert list(candles.index) == list(expected.index.values.astype("datetime64[D]"))
+		np.testing.assert_array_equal(candles["Close"], expected["Close"])
+
+def test_dates_outside_calendar_fail(tmp_path):
+	data = generate_candles(100, 1)
+	store = UniverseStore.create(str(tmp_path), data.index[::2], 1)
+	with pytest.raises(ValueError, match="missing from the universe calendar"):
+		store.write("AAA", data)
+	assert "AAA" not in store.tickers
@@ -0,0 +1,32 @@
+import os
+import pytest
+import workqueue
+from workqueue import WorkQueue
+
+@pytest.mark.parametrize("qtype", ["file", "sqlite"])
+def test_shards_complete_once(tmp_path, qtype):
+	queue = WorkQueue(qtype, str(tmp_path / "queue"), lease_seconds=60)
+	queue.create({"gains":5}, [("AAA", "BBB"), ("CCC",)])
+	assert queue.getParams() == {"gains":5}
+	leased = [queue.lease("w1"), queue.lease("w2")]
+	assert sorted(tickers for _, tickers in leased) == [("AAA", "BBB"), ("CCC",)]
+	assert queue.lease("w3") is None
+	for shard_id, tickers in leased:
+		queue.complete(shard_id, "w1", [{"ticker":ticker} for ticker in tickers])
+	assert queue.status()["done"] == 2
+	assert [row["ticker"] for row in queue.results()] == ["AAA", "BBB", "CCC"]
+
+def test_old_shard_lease_survives_concurrent_reclaim(tmp_path, monkeypatch):
+	queue = WorkQueue("file", str(tmp_path / "queue"), lease_seconds=60)
+	queue.create({}, [("AAA",)])
+	# Shards were queued long before the lease
+	pending = queue.queue.statePath("pending", 0)
+	os.utime(pending, (0, 0))
+
+	rename = os.rename
+	def rename_then_reclaim(source, target):
+		rename(source, target)
+		queue.queue.reclaim()
+	monkeypatch.setattr(workqueue.os, "rename", rename_then_reclaim)
+	assert queue.lease("w1") == (0, ("AAA",))
+	assert queue.status()["leased"] == 1
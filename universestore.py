@@ -0,0 +1,165 @@
+import os
+import json
+import logging
+import numpy as np
+from collections.abc import Mapping
+from candlestore import FIELDS, normalize_candles
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class CandleView(Mapping):
+	"""Read-only OHLCV columns of a single ticker
+
+	Maps field name to a column array. Columns backed by a UniverseStore are
+	zero-copy views into its memory-mapped files and pickle as a reference
+	to the store, so they can be passed to worker processes cheaply.
+
+	Attributes:
+		index: candle dates
+		columns: field -> array
+		source: (path, row, first, last) when backed by a store, else None
+	"""
+	def __init__(self, index, columns:dict, source:tuple=None):
+		self.index = index
+		self.columns = columns
+		self.source = source
+
+	def __getitem__(self, field):
+		return self.columns[field]
+
+	def __iter__(self):
+		return iter(self.columns)
+
+	def __len__(self):
+		return len(self.index)
+
+	def __reduce__(self):
+		if self.source is None:
+			return (CandleView, (self.index, self.columns))
+		return (load_view, self.source)
+
+
+class UniverseStore:
+	"""Memory-mapped universe price store
+
+	Keeps one memory-mapped float64 file per field with one row per ticker,
+	all aligned on a shared date index, plus a ticker -> row index.
+
+	Layout:
+		dates.npy: shared date index, datetime64[D]
+		index.json: capacity and ticker -> [row, first, last, gaps]
+		<field>.f8: (capacity, len(dates)) float64 memmap, NaN where missing
+
+	Attributes:
+		path: store directory
+		dates: shared date index
+		capacity: max number of tickers
+		tickers: ticker -> [row, first, last, gaps]
+		fields: field -> memmap
+	"""
+	def __init__(self, path, mode="r"):
+		self.path = path
+		self.mode = mode
+		self.dates = np.load(os.path.join(path, "dates.npy"))
+		with open(os.path.join(path, "index.json"), "r") as f:
+			index = json.load(f)
+		self.capacity = index["capacity"]
+		self.tickers = index["tickers"]
+		self.fields = {field: self.openField(field, mode) for field in FIELDS}
+		logger.info(f"opened universe store {path} with {len(self.tickers)} tickers")
+
+	def openField(self, field, mode):
+		"""Memory map a field file"""
+		path = os.path.join(self.path, field + ".f8")
+		return np.memmap(path, dtype=np.float64, mode=mode, shape=(self.capacity, len(self.dates)))
+
+	@staticmethod
+	def create(path, dates, capacity:int):
+		"""Create an empty store for capacity tickers aligned on dates, open for writing"""
+		os.makedirs(path, exist_ok=True)
+		dates = np.asarray(dates).astype("datetime64[D]")
+		np.save(os.path.join(path, "dates.npy"), dates)
+		with open(os.path.join(path, "index.json"), "w") as f:
+			json.dump({"capacity":capacity, "tickers":{}}, f)
+		for field in FIELDS:
+			column = np.memmap(os.path.join(path, field + ".f8"), dtype=np.float64, mode="w+", shape=(capacity, len(dates)))
+			column[:] = np.nan
+			column.flush()
+		logger.info(f"created universe store {path} for {capacity} tickers and {len(dates)} dates")
+		return UniverseStore(path, mode="r+")
+
+	def write(self, ticker, data):
+		"""Write candle data of a ticker into its row, aligned on the shared dates
+
+		Candles are never dropped: a ticker trading on a date missing from
+		the shared dates is refused, its risk would differ from a scan
+		without the store.
+		"""
+		if ticker in self.tickers:
+			row = self.tickers[ticker][0]
+		elif len(self.tickers) < self.capacity:
+			row = len(self.tickers)
+		else:
+			logger.error(f"Universe store is full, can not add {ticker}")
+			raise ValueError("Universe store is full")
+
+		data = normalize_candles(data)
+		dates = np.asarray(data.index).astype("datetime64[D]")
+		positions = np.minimum(np.searchsorted(self.dates, dates), len(self.dates) - 1)
+		known = self.dates[positions] == dates
+		if not known.all():
+			logger.error(f"{ticker}: {int((~known).sum())} candles on dates missing from shared dates")
+			raise ValueError(
+				f"{ticker} has {int((~known).sum())} candles on dates missing from the universe calendar, "
+				f"first on {dates[~known][0]}"
+			)
+		for field in FIELDS:
+			self.fields[field][row, :] = np.nan
+			self.fields[field][row, positions] = np.asarray(data[field], dtype=float)
+
+		if len(positions):
+			first, last = int(positions.min()), int(positions.max())
+			gaps = (last - first + 1) - len(positions)
+		else:
+			first, last, gaps = 0, -1, 0
+		self.tickers[ticker] = [row, first, last, gaps]
+
+	def flush(self):
+		"""Flush field files and ticker index to disk"""
+		for column in self.fields.values():
+			column.flush()
+		with open(os.path.join(self.path, "index.json"), "w") as f:
+			json.dump({"capacity":self.capacity, "tickers":self.tickers}, f)
+
+	def view(self, row, first, last) -> CandleView:
+		"""Return zero-copy column views of a row between first and last date"""
+		columns = {field: self.fields[field][row, first:last + 1] for field in FIELDS}
+		index = self.dates[first:last + 1]
+		return CandleView(index, columns, (self.path, row, first, last))
+
+	def getCandles(self, ticker) -> CandleView:
+		"""Return candle columns of a ticker
+
+		Columns are zero-copy views unless the ticker misses some of the
+		shared dates inside its range, then missing dates are dropped in a copy.
+		"""
+		if ticker not in self.tickers:
+			logger.error(f"{ticker} not in universe store")
+			raise ValueError(f"{ticker} not in universe store")
+		row, first, last, gaps = self.tickers[ticker]
+		view = self.view(row, first, last)
+		if not gaps:
+			return view
+		logger.info(f"{ticker}: {gaps} missing dates, copying columns")
+		valid = ~np.isnan(view["Close"])
+		return CandleView(view.index[valid], {field: np.asarray(column)[valid] for field, column in view.items()})
+
+
+_open_stores = {}
+
+def load_view(path, row, first, last) -> CandleView:
+	"""Return a store backed view, opening the store once per process"""
+	if path not in _open_stores:
+		_open_stores[path] = UniverseStore(path)
+	return _open_stores[path].view(row, first, last)
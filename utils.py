@@ -1,15 +1,20 @@
+import os
+import gc
 import json
 import logging
+import tempfile
 import datetime
 import config
-import yfinance as yf
-import pandas as pd
 import functools
 from collections import Counter
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Process umask, read once at import since os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
 def load_tickers(filename:str) -> tuple:
 	"""Load tickers from file to tuple"""
 	tickers = []
@@ -23,9 +28,41 @@ def date_to_str(date):
 	ret = date.strftime("%Y-%m-%d")
 	return ret
 
+def current_rss() -> int:
+	"""Return resident set size of this process in bytes, peak RSS where unavailable"""
+	try:
+		with open("/proc/self/statm", "r") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError):
+		import resource
+		# ru_maxrss is in KiB on Linux, bytes on macOS
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def release_memory():
+	"""Collect garbage and return freed heap pages to the OS where possible"""
+	gc.collect()
+	try:
+		import ctypes
+		ctypes.CDLL("libc.so.6").malloc_trim(0)
+	except (OSError, AttributeError):
+		pass
+
 def pprint(msg):
 	print(f"[+] {msg}")
 
-def write_candidate(ticker, filename=config.CANDIDATES_FILE):
-	with open(filename, "a") as f:
-		f.write(ticker + "\n")
+def chmod_umask(path):
+	"""Give a file the permissions open() would have created it with
+
+	tempfile.mkstemp creates files readable by their owner only, published
+	files must stay readable by jobs running as other users.
+	"""
+	os.chmod(path, 0o666 & ~UMASK)
+
+def write_candidates(tickers, filename=config.CANDIDATES_FILE):
+	"""Atomically replace candidates file with given tickers"""
+	directory = os.path.dirname(os.path.abspath(filename))
+	fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+	with os.fdopen(fd, "w") as f:
+		f.write("".join(ticker + "\n" for ticker in tickers))
+	chmod_umask(tmp_path)
+	os.replace(tmp_path, filename)
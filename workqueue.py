@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import contextlib
+from abc import ABC, abstractmethod
+from utils import chmod_umask
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+def make_shards(tickers, size:int) -> list:
+	"""Split tickers into consecutive shards of at most size tickers"""
+	tickers = tuple(tickers)
+	return [tickers[i:i + size] for i in range(0, len(tickers), max(1, size))]
+
+
+class WorkQueue:
+	"""Shard work queue wrapper class
+
+	Shards are leased to workers for lease_seconds. A worker renews its
+	lease while it works, a lease that ran out is handed to the next
+	worker asking, so shards of dead workers are picked up again. Shards
+	leased max_attempts times without completing are marked failed.
+
+	Attributes:
+		qtype: queue type, sqlite or file
+		queue: queue instance
+	"""
+	def __init__(self, qtype, path, **kwargs):
+		lease_seconds = kwargs.pop("lease_seconds", 600)
+		max_attempts = kwargs.pop("max_attempts", 3)
+		if qtype == "sqlite":
+			self.queue = SQLiteQueue(path, lease_seconds, max_attempts)
+		elif qtype == "file":
+			self.queue = FileQueue(path, lease_seconds, max_attempts)
+		else:
+			logger.error("Wrong work queue type")
+			raise ValueError("Wrong work queue type")
+
+	def create(self, params:dict, shards:list):
+		"""Replace queue contents with scan parameters and shards"""
+		self.queue.create(params, shards)
+
+	def getParams(self) -> dict:
+		"""Return scan parameters the queue was created with"""
+		return self.queue.getParams()
+
+	def lease(self, worker) -> tuple:
+		"""Return (shard_id, tickers) leased to worker or None if nothing is left"""
+		return self.queue.lease(worker)
+
+	def renew(self, shard_id, worker):
+		"""Extend a lease"""
+		self.queue.renew(shard_id, worker)
+
+	def complete(self, shard_id, worker, rows:list):
+		"""Store shard result rows and mark it done"""
+		self.queue.complete(shard_id, worker, rows)
+
+	def status(self) -> dict:
+		"""Return number of pending, leased, done and failed shards"""
+		return self.queue.status()
+
+	def results(self) -> list:
+		"""Return result rows of done shards in shard order"""
+		return self.queue.results()
+
+
+class BaseQueue(ABC):
+	"""Work queue base class
+
+	Attributes:
+		path: queue database file or directory
+		lease_seconds: lease duration
+		max_attempts: leases per shard before it fails
+	"""
+	def __init__(self, path, lease_seconds:float, max_attempts:int):
+		self.path = path
+		self.lease_seconds = lease_seconds
+		self.max_attempts = max_attempts
+
+	@abstractmethod
+	def create(self, params:dict, shards:list):
+		pass
+
+	@abstractmethod
+	def getParams(self) -> dict:
+		pass
+
+	@abstractmethod
+	def lease(self, worker) -> tuple:
+		pass
+
+	@abstractmethod
+	def renew(self, shard_id, worker):
+		pass
+
+	@abstractmethod
+	def complete(self, shard_id, worker, rows:list):
+		pass
+
+	@abstractmethod
+	def status(self) -> dict:
+		pass
+
+	@abstractmethod
+	def results(self) -> list:
+		pass
+
+
+class SQLiteQueue(BaseQueue):
+	"""SQLite work queue for workers on one host
+
+	Leases are taken in an immediate transaction, so two workers never
+	lease the same shard at once. SQLite locking is unreliable on network
+	file systems, workers on several nodes should share a file queue.
+	"""
+	@contextlib.contextmanager
+	def connect(self):
+		"""Yield an autocommit connection, closed on exit"""
+		connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+		try:
+			connection.execute("PRAGMA journal_mode=WAL")
+			yield connection
+		finally:
+			connection.close()
+
+	def create(self, params:dict, shards:list):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with self.connect() as db:
+			db.execute("BEGIN IMMEDIATE")
+			db.execute("DROP TABLE IF EXISTS meta")
+			db.execute("DROP TABLE IF EXISTS shards")
+			db.execute("CREATE TABLE meta (params TEXT)")
+			db.execute(
+				"CREATE TABLE shards (id INTEGER PRIMARY KEY, tickers TEXT, state TEXT, worker TEXT,"
+				" lease_until REAL, attempts INTEGER, rows TEXT)"
+			)
+			db.execute("INSERT INTO meta VALUES (?)", (json.dumps(params),))
+			db.executemany(
+				"INSERT INTO shards VALUES (?, ?, 'pending', NULL, 0, 0, NULL)",
+				[(i, json.dumps(shard)) for i, shard in enumerate(shards)]
+			)
+			db.execute("COMMIT")
+		logger.info(f"Queued {len(shards)} shards in {self.path}")
+
+	def getParams(self) -> dict:
+		with self.connect() as db:
+			return json.loads(db.execute("SELECT params FROM meta").fetchone()[0])
+
+	def lease(self, worker) -> tuple:
+		now = time.time()
+		with self.connect() as db:
+			db.execute("BEGIN IMMEDIATE")
+			db.execute(
+				"UPDATE shards SET state = 'failed' WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+				(now, self.max_attempts)
+			)
+			row = db.execute(
+				"SELECT id, tickers FROM shards WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)"
+				" ORDER BY id LIMIT 1", (now,)
+			).fetchone()
+			if row is not None:
+				db.execute(
+					"UPDATE shards SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+					(str(worker), now + self.lease_seconds, row[0])
+				)
+			db.execute("COMMIT")
+		if row is None:
+			return None
+		return row[0], tuple(json.loads(row[1]))
+
+	def renew(self, shard_id, worker):
+		with self.connect() as db:
+			db.execute(
+				"UPDATE shards SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+				(time.time() + self.lease_seconds, shard_id, str(worker))
+			)
+
+	def complete(self, shard_id, worker, rows:list):
+		with self.connect() as db:
+			db.execute(
+				"UPDATE shards SET state = 'done', worker = ?, rows = ? WHERE id = ? AND state != 'done'",
+				(str(worker), json.dumps(rows, default=str), shard_id)
+			)
+
+	def status(self) -> dict:
+		counts = {"pending":0, "leased":0, "done":0, "failed":0}
+		with self.connect() as db:
+			for state, count in db.execute("SELECT state, COUNT(*) FROM shards GROUP BY state"):
+				counts[state] = count
+		return counts
+
+	def results(self) -> list:
+		with self.connect() as db:
+			return [
+				row for (rows,) in db.execute("SELECT rows FROM shards WHERE state = 'done' ORDER BY id")
+				for row in json.loads(rows)
+			]
+
+
+class FileQueue(BaseQueue):
+	"""Directory work queue, one JSON file per shard
+
+	A shard moves between pending/, leased/, done/ and failed/ by atomic
+	renames, so only one worker wins a lease. Lease expiry is the leased
+	file's modification time. A shard may be processed twice if a lease
+	expires while its worker is still alive, completing it again is harmless.
+	"""
+	STATES = ("pending", "leased", "done", "failed")
+
+	def statePath(self, state, shard_id=None) -> str:
+		if shard_id is None:
+			return os.path.join(self.path, state)
+		return os.path.join(self.path, state, f"{shard_id:08d}.json")
+
+	def write(self, path, content:dict):
+		"""Atomically write a JSON file"""
+		fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+		with os.fdopen(fd, "w") as f:
+			json.dump(content, f, default=str)
+		# Workers on other nodes may run as other users
+		chmod_umask(tmp_path)
+		os.replace(tmp_path, path)
+
+	def create(self, params:dict, shards:list):
+		for state in self.STATES:
+			os.makedirs(self.statePath(state), exist_ok=True)
+			for name in os.listdir(self.statePath(state)):
+				os.remove(os.path.join(self.statePath(state), name))
+		self.write(os.path.join(self.path, "params.json"), params)
+		for i, shard in enumerate(shards):
+			self.write(self.statePath("pending", i), {"id":i, "tickers":list(shard), "attempts":0})
+		logger.info(f"Queued {len(shards)} shards in {self.path}")
+
+	def getParams(self) -> dict:
+		with open(os.path.join(self.path, "params.json"), "r") as f:
+			return json.load(f)
+
+	def reclaim(self):
+		"""Move expired leases back to pending"""
+		now = time.time()
+		for name in sorted(os.listdir(self.statePath("leased"))):
+			path = os.path.join(self.statePath("leased"), name)
+			try:
+				if os.path.getmtime(path) + self.lease_seconds < now:
+					os.rename(path, os.path.join(self.statePath("pending"), name))
+					logger.info(f"Lease of shard {name} expired")
+			except FileNotFoundError:
+				# Completed or reclaimed meanwhile
+				continue
+
+	def lease(self, worker) -> tuple:
+		self.reclaim()
+		for name in sorted(os.listdir(self.statePath("pending"))):
+			pending = os.path.join(self.statePath("pending"), name)
+			leased = os.path.join(self.statePath("leased"), name)
+			try:
+				# Renames keep the modification time, start the lease before
+				# publishing it so reclaim never sees an old shard as expired
+				os.utime(pending)
+				os.rename(pending, leased)
+			except FileNotFoundError:
+				# Another worker won this one
+				continue
+			with open(leased, "r") as f:
+				shard = json.load(f)
+			shard["attempts"] += 1
+			shard["worker"] = str(worker)
+			if shard["attempts"] > self.max_attempts:
+				self.write(self.statePath("failed", shard["id"]), shard)
+				os.remove(leased)
+				continue
+			self.write(leased, shard)
+			return shard["id"], tuple(shard["tickers"])
+		return None
+
+	def renew(self, shard_id, worker):
+		try:
+			os.utime(self.statePath("leased", shard_id))
+		except FileNotFoundError:
+			logger.info(f"Shard {shard_id} is no longer leased")
+
+	def complete(self, shard_id, worker, rows:list):
+		self.write(self.statePath("done", shard_id), {"id":shard_id, "worker":str(worker), "rows":rows})
+		try:
+			os.remove(self.statePath("leased", shard_id))
+		except FileNotFoundError:
+			pass
+
+	def status(self) -> dict:
+		done = set(os.listdir(self.statePath("done")))
+		counts = {state: len(set(os.listdir(self.statePath(state))) - done) for state in self.STATES}
+		counts["done"] = len(done)
+		return counts
+
+	def results(self) -> list:
+		rows = []
+		for name in sorted(os.listdir(self.statePath("done"))):
+			with open(os.path.join(self.statePath("done"), name), "r") as f:
+				rows.extend(json.load(f)["rows"])
+		return rows